@@ -0,0 +1,19 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ActionBufferConfig:
+    ENABLED = os.getenv("ACTIONS_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    MAX_SIZE = int(os.getenv("ACTIONS_BUFFER_MAX_SIZE", "10000"))
+    BATCH_SIZE = int(os.getenv("ACTIONS_BUFFER_BATCH_SIZE", "1000"))
+    FLUSH_INTERVAL_SECONDS = float(
+        os.getenv("ACTIONS_BUFFER_FLUSH_INTERVAL_SECONDS", "0.5")
+    )
+    # "memory": acknowledge once queued, "flush": wait for the batch to commit
+    DURABILITY = os.getenv("ACTIONS_BUFFER_DURABILITY", "memory")
+
+
+action_buffer_config = ActionBufferConfig()
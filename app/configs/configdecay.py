@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class DecayJobConfig:
+    ENABLED = os.getenv("DECAY_JOB_ENABLED", "false").lower() in ("1", "true", "yes")
+    INTERVAL_SECONDS = float(os.getenv("DECAY_JOB_INTERVAL_SECONDS", "60"))
+    CHUNK_SIZE = int(os.getenv("DECAY_JOB_CHUNK_SIZE", "10000"))
+    TIME_BUDGET_SECONDS = float(os.getenv("DECAY_JOB_TIME_BUDGET_SECONDS", "5"))
+    # leader lock directory for deployments without Postgres advisory locks
+    LOCK_DIR = os.getenv("DECAY_JOB_LOCK_DIR", tempfile.gettempdir())
+
+
+decay_config = DecayJobConfig()
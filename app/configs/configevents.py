@@ -0,0 +1,25 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PetEventsConfig:
+    # "local" reaches subscribers of this worker only, "postgres" every worker
+    BACKEND = os.getenv("PET_EVENTS_BACKEND", "local")
+    HEARTBEAT_SECONDS = float(os.getenv("PET_EVENTS_HEARTBEAT_SECONDS", "15"))
+    # states kept per slow subscriber; older ones are skipped, not queued
+    QUEUE_SIZE = int(os.getenv("PET_EVENTS_QUEUE_SIZE", "8"))
+
+
+class ThresholdEventsConfig:
+    # threshold events are scheduled only when they have somewhere to go
+    WEBHOOK_URL = os.getenv("THRESHOLD_WEBHOOK_URL", "")
+    WEBHOOK_TIMEOUT_SECONDS = float(os.getenv("THRESHOLD_WEBHOOK_TIMEOUT_SECONDS", "5"))
+    CHUNK_SIZE = int(os.getenv("THRESHOLD_EVENTS_CHUNK_SIZE", "10000"))
+    LEADER_CHECK_SECONDS = float(os.getenv("THRESHOLD_EVENTS_LEADER_CHECK_SECONDS", "30"))
+
+
+pet_events_config = PetEventsConfig()
+threshold_events_config = ThresholdEventsConfig()
@@ -0,0 +1,13 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class MetricsConfig:
+    # /metrics is not authenticated, so it is only served when asked for
+    ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+metrics_config = MetricsConfig()
@@ -0,0 +1,14 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class PartitionConfig:
+    # only used when pet_actions is partitioned (Postgres, see the migrations)
+    MONTHS_AHEAD = int(os.getenv("ACTIONS_PARTITION_MONTHS_AHEAD", "3"))
+    INTERVAL_SECONDS = float(os.getenv("ACTIONS_PARTITION_INTERVAL_SECONDS", "86400"))
+
+
+partition_config = PartitionConfig()
@@ -0,0 +1,18 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ProfilerConfig:
+    ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+    # fraction of requests profiled from start to end, 0 profiles only slow ones
+    SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+    # requests still running after this are profiled from then on
+    SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "500"))
+    INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+    OUTPUT_DIR = os.getenv("PROFILER_OUTPUT_DIR", "profiles")
+
+
+profiler_config = ProfilerConfig()
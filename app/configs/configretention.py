@@ -0,0 +1,20 @@
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class RetentionConfig:
+    ENABLED = os.getenv("ACTIONS_RETENTION", "false").lower() in ("1", "true", "yes")
+    # actions older than this move from pet_actions to the archive
+    RETENTION_DAYS = int(os.getenv("ACTIONS_RETENTION_DAYS", "180"))
+    ARCHIVE_DIR = os.getenv("ACTIONS_ARCHIVE_DIR", "archive/pet_actions")
+    BATCH_SIZE = int(os.getenv("ACTIONS_RETENTION_BATCH_SIZE", "10000"))
+    INTERVAL_SECONDS = float(os.getenv("ACTIONS_RETENTION_INTERVAL_SECONDS", "3600"))
+    TIME_BUDGET_SECONDS = float(
+        os.getenv("ACTIONS_RETENTION_TIME_BUDGET_SECONDS", "60")
+    )
+
+
+retention_config = RetentionConfig()
@@ -0,0 +1,131 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from database.models import ActionType
+from middleware.pet_decay import as_utc
+
+# pets are spread over this many files per month so that reading one pet's
+# history only decompresses a small slice of the month
+ARCHIVE_BUCKETS = 64
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ArchivedAction(NamedTuple):
+    id: int
+    action_type: ActionType
+    timestamp: datetime
+
+
+def to_micros(moment: datetime) -> int:
+    return (as_utc(moment) - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+class ActionArchive:
+    """Gzip-compressed, column-oriented monthly files of archived ``pet_actions``.
+
+    Every append adds one gzip member holding a JSON object of equal-length
+    column arrays (``id``, ``pet_id``, ``action_type``, ``timestamp`` in epoch
+    microseconds) to ``<root>/<YYYY-MM>/bucket-<NNN>.jsonl.gz``.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def path(self, month: str, pet_id: int) -> Path:
+        return self.root / month / f"bucket-{pet_id % ARCHIVE_BUCKETS:03}.jsonl.gz"
+
+    def append(self, rows: Iterable) -> int:
+        """Durably write ``(id, pet_id, action_type, timestamp)`` rows."""
+        files = defaultdict(lambda: defaultdict(list))
+        count = 0
+        for action_id, pet_id, action_type, timestamp in rows:
+            columns = files[self.path(as_utc(timestamp).strftime("%Y-%m"), pet_id)]
+            columns["id"].append(action_id)
+            columns["pet_id"].append(pet_id)
+            columns["action_type"].append(ActionType(action_type).value)
+            columns["timestamp"].append(to_micros(timestamp))
+            count += 1
+
+        for path, columns in files.items():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            member = gzip.compress(json.dumps(columns).encode("utf-8") + b"\n")
+            with open(path, "ab") as file:
+                file.write(member)
+                file.flush()
+                os.fsync(file.fileno())
+
+        return count
+
+    def read_month(
+        self,
+        month: str,
+        pet_id: int,
+        before: Optional[tuple[datetime, int]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        action_type: Optional[ActionType] = None,
+    ) -> list[ArchivedAction]:
+        """Matching actions of one pet in one month, newest first."""
+        path = self.path(month, pet_id)
+        if not path.exists():
+            return []
+
+        before_key = (to_micros(before[0]), before[1]) if before else None
+        since_micros = to_micros(since) if since else None
+        until_micros = to_micros(until) if until else None
+
+        found = {}
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                columns = json.loads(line)
+                for action_id, owner, kind, micros in zip(
+                    columns["id"],
+                    columns["pet_id"],
+                    columns["action_type"],
+                    columns["timestamp"],
+                ):
+                    if owner != pet_id:
+                        continue
+                    if action_type is not None and kind != action_type.value:
+                        continue
+                    if since_micros is not None and micros < since_micros:
+                        continue
+                    if until_micros is not None and micros >= until_micros:
+                        continue
+                    if before_key is not None and (micros, action_id) >= before_key:
+                        continue
+                    # an interrupted archival run may have written a batch twice
+                    found[action_id] = (micros, kind)
+
+        return [
+            ArchivedAction(action_id, ActionType(kind), from_micros(micros))
+            for action_id, (micros, kind) in sorted(
+                found.items(), key=lambda item: (item[1][0], item[0]), reverse=True
+            )
+        ]
+
+    def read_history(
+        self, pet_id: int, months: list[str], limit: Optional[int] = None, **filters
+    ) -> Iterator[ArchivedAction]:
+        """Walk ``months`` newest first, stopping once ``limit`` actions were read.
+
+        Months are disjoint time ranges, so whole months can be concatenated.
+        """
+        count = 0
+        for month in sorted(months, reverse=True):
+            for action in self.read_month(month, pet_id, **filters):
+                yield action
+                count += 1
+            if limit is not None and count >= limit:
+                return
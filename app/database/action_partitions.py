@@ -0,0 +1,92 @@
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from middleware.pet_decay import as_utc
+
+# pet_actions is range-partitioned by month on Postgres (see migration
+# f4c1b9e7a2d6); partitions are named after the month they hold
+PARTITION_NAME = re.compile(r"^pet_actions_(\d{4})_(\d{2})$")
+
+
+def month_start(moment: datetime) -> datetime:
+    return as_utc(moment).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    if month.month == 12:
+        return month.replace(year=month.year + 1, month=1)
+    return month.replace(month=month.month + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"pet_actions_{month:%Y_%m}"
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+
+    return await db.scalar(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = 'pet_actions')"
+        )
+    )
+
+
+async def list_partitions(db: AsyncSession) -> list[datetime]:
+    """First instants of the months that have a partition, oldest first."""
+    result = await db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'pet_actions'"
+        )
+    )
+
+    months = []
+    for name in result.scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(
+                datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc)
+            )
+
+    return sorted(months)
+
+
+async def create_partitions(
+    db: AsyncSession, now: datetime, months_ahead: int
+) -> list[str]:
+    """Make sure the current month and the next ``months_ahead`` have a partition."""
+    existing = set(await list_partitions(db))
+
+    created = []
+    month = month_start(now)
+    for _ in range(months_ahead + 1):
+        if month not in existing:
+            name = partition_name(month)
+            await db.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF pet_actions "
+                    f"FOR VALUES FROM ('{month.isoformat()}') "
+                    f"TO ('{next_month(month).isoformat()}')"
+                )
+            )
+            created.append(name)
+        month = next_month(month)
+
+    return created
+
+
+async def detach_partition(db: AsyncSession, month: datetime, drop: bool = True):
+    """Remove a whole month of history without deleting its rows one by one."""
+    name = partition_name(month)
+    await db.execute(text(f"ALTER TABLE pet_actions DETACH PARTITION {name}"))
+    if drop:
+        await db.execute(text(f"DROP TABLE {name}"))
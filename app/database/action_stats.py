@@ -0,0 +1,65 @@
+from collections import Counter
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.functions import utc_date
+from database.models import PetActionDaily, PetActions
+from middleware.pet_decay import as_utc
+
+UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def upsert_action_stats(dialect_name: str):
+    """``INSERT INTO pet_action_daily`` that adds to the count of existing days."""
+    statement = UPSERTS[dialect_name](PetActionDaily)
+    return statement, statement.on_conflict_do_update(
+        index_elements=["pet_id", "day", "action_type"],
+        set_={"count": PetActionDaily.count + statement.excluded.count},
+    )
+
+
+def rollup_rows(records: list[dict]) -> list[dict]:
+    counts = Counter(
+        (
+            record["pet_id"],
+            as_utc(record["timestamp"]).date(),
+            record["action_type"],
+        )
+        for record in records
+    )
+    return [
+        {"pet_id": pet_id, "day": day, "action_type": action_type, "count": count}
+        for (pet_id, day, action_type), count in counts.items()
+    ]
+
+
+async def increment_action_stats(db, records: list[dict]):
+    if not records:
+        return
+
+    _, upsert = upsert_action_stats(db.bind.dialect.name)
+    await db.execute(upsert.values(rollup_rows(records)))
+
+
+async def rebuild_action_stats(db, first_pet_id: int, last_pet_id: int) -> int:
+    """Recount the rollup of pets in ``[first_pet_id, last_pet_id)`` from raw actions."""
+    await db.execute(
+        delete(PetActionDaily).where(
+            PetActionDaily.pet_id >= first_pet_id, PetActionDaily.pet_id < last_pet_id
+        )
+    )
+
+    day = utc_date(PetActions.timestamp)
+    counts = (
+        select(PetActions.pet_id, day, PetActions.action_type, func.count())
+        .where(PetActions.pet_id >= first_pet_id, PetActions.pet_id < last_pet_id)
+        .group_by(PetActions.pet_id, day, PetActions.action_type)
+    )
+
+    statement, _ = upsert_action_stats(db.bind.dialect.name)
+    result = await db.execute(
+        statement.from_select(["pet_id", "day", "action_type", "count"], counts)
+    )
+    return result.rowcount
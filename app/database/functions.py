@@ -0,0 +1,111 @@
+from sqlalchemy import Date, DateTime, Float, Integer
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+
+class least(FunctionElement):
+    inherit_cache = True
+
+
+class greatest(FunctionElement):
+    inherit_cache = True
+
+
+class floor_int(FunctionElement):
+    type = Integer()
+    inherit_cache = True
+
+
+class minutes_between(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+class add_minutes(FunctionElement):
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(least)
+def _least(element, compiler, **kw):
+    return "LEAST(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(least, "sqlite")
+def _least_sqlite(element, compiler, **kw):
+    return "min(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(greatest)
+def _greatest(element, compiler, **kw):
+    return "GREATEST(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(greatest, "sqlite")
+def _greatest_sqlite(element, compiler, **kw):
+    return "max(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(floor_int)
+def _floor_int(element, compiler, **kw):
+    return "CAST(FLOOR(%s) AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(floor_int, "sqlite")
+def _floor_int_sqlite(element, compiler, **kw):
+    # only used on non-negative values, where truncation is the floor
+    return "CAST(%s AS INTEGER)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(minutes_between)
+def _minutes_between(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "(EXTRACT(EPOCH FROM (%s - %s)) / 60.0)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(minutes_between, "sqlite")
+def _minutes_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return "((julianday(%s) - julianday(%s)) * 1440.0)" % (
+        compiler.process(end, **kw),
+        compiler.process(start, **kw),
+    )
+
+
+@compiles(add_minutes)
+def _add_minutes(element, compiler, **kw):
+    moment, minutes = list(element.clauses)
+    return "(%s + (%s) * INTERVAL '1 minute')" % (
+        compiler.process(moment, **kw),
+        compiler.process(minutes, **kw),
+    )
+
+
+@compiles(add_minutes, "sqlite")
+def _add_minutes_sqlite(element, compiler, **kw):
+    moment, minutes = list(element.clauses)
+    return "strftime('%%Y-%%m-%%d %%H:%%M:%%f', %s, (%s) || ' minutes')" % (
+        compiler.process(moment, **kw),
+        compiler.process(minutes, **kw),
+    )
+
+
+class utc_date(FunctionElement):
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(utc_date)
+def _utc_date(element, compiler, **kw):
+    return "CAST((%s AT TIME ZONE 'UTC') AS DATE)" % compiler.process(
+        element.clauses, **kw
+    )
+
+
+@compiles(utc_date, "sqlite")
+def _utc_date_sqlite(element, compiler, **kw):
+    # SQLite keeps timestamps as naive UTC strings
+    return "date(%s)" % compiler.process(element.clauses, **kw)
@@ -1,9 +1,9 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from enum import Enum
 
-from sqlalchemy import DateTime
+from sqlalchemy import Date, DateTime
 from sqlalchemy import Enum as SQLEnum
-from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy import ForeignKey, Index, Integer, PrimaryKeyConstraint, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from configs.configdb import Base
@@ -17,6 +17,7 @@ class ActionType(str, Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_username", "username", unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     username: Mapped[str] = mapped_column(String(50), nullable=False)
@@ -28,16 +29,34 @@ class User(Base):
     )
 
     pets: Mapped[list["Pet"]] = relationship(
-        back_populates="owner", cascade="all, delete-orphan"
+        back_populates="owner", cascade="all, delete-orphan", passive_deletes=True
+    )
+
+
+def default_critical_at(context):
+    # imported here because the decay rules import this module
+    from middleware.pet_decay import PET_STATS, critical_at
+
+    params = context.get_current_parameters()
+    return critical_at(
+        {name: params[name] for name in PET_STATS}, params["last_updated"]
     )
 
 
 class Pet(Base):
     __tablename__ = "pets"
+    __table_args__ = (
+        Index("ix_pets_owner_id_id", "owner_id", "id"),
+        Index("ix_pets_owner_id_name", "owner_id", "name"),
+        Index("ix_pets_critical_at_id", "critical_at", "id"),
+        Index("ix_pets_owner_id_critical_at_id", "owner_id", "critical_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(50), nullable=False)
-    owner_id: Mapped[int] = mapped_column(Integer, ForeignKey("users.id"))
+    owner_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE")
+    )
     hunger: Mapped[int] = mapped_column(Integer, nullable=False, default=100)
     happiness: Mapped[int] = mapped_column(Integer, nullable=False, default=100)
     energy: Mapped[int] = mapped_column(Integer, nullable=False, default=100)
@@ -46,10 +65,14 @@ class Pet(Base):
         default=lambda: datetime.now(timezone.utc),
         nullable=False,
     )
+    # when the lowest stat reaches CRITICAL_LEVEL; written with every stat change
+    critical_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=default_critical_at, nullable=False
+    )
 
     owner: Mapped["User"] = relationship(back_populates="pets")
     actions: Mapped[list["PetActions"]] = relationship(
-        back_populates="pet", cascade="all, delete-orphan"
+        back_populates="pet", cascade="all, delete-orphan", passive_deletes=True
     )
 
 
@@ -57,7 +80,9 @@ class PetActions(Base):
     __tablename__ = "pet_actions"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    pet_id: Mapped[int] = mapped_column(Integer, ForeignKey("pets.id"))
+    pet_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("pets.id", ondelete="CASCADE")
+    )
     action_type: Mapped[ActionType] = mapped_column(SQLEnum(ActionType), nullable=False)
     timestamp: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -66,3 +91,26 @@ class PetActions(Base):
     )
 
     pet: Mapped["Pet"] = relationship(back_populates="actions")
+
+    __table_args__ = (
+        Index(
+            "ix_pet_actions_pet_id_timestamp_id",
+            pet_id,
+            timestamp.desc(),
+            id.desc(),
+        ),
+    )
+
+
+class PetActionDaily(Base):
+    """Per-day action counts kept in step with ``pet_actions`` as actions are written."""
+
+    __tablename__ = "pet_action_daily"
+    __table_args__ = (PrimaryKeyConstraint("pet_id", "day", "action_type"),)
+
+    pet_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("pets.id", ondelete="CASCADE")
+    )
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    action_type: Mapped[ActionType] = mapped_column(SQLEnum(ActionType), nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -1,19 +1,138 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
+from datetime import timedelta
 
 from fastapi import FastAPI
 
-from configs.configdb import async_engine
+from configs.configdb import (async_engine, async_session, db_config,
+                              read_router)
+from configs.configdecay import decay_config
+from configs.configevents import pet_events_config, threshold_events_config
+from configs.configmetrics import metrics_config
+from configs.configpartitions import partition_config
+from configs.configprofiler import profiler_config
+from configs.configretention import retention_config
 from database.models import Base
-from middleware.pet_decay import PetDecayMiddleware
+from middleware.action_buffer import action_buffer
+from middleware.action_partitions import ActionPartitionJob, run_partition_job
+from middleware.action_retention import (ActionRetentionJob, action_archive,
+                                         run_retention_job)
+from middleware.metrics import (MetricsMiddleware, register_hasher_metrics,
+                                register_pool_metrics, register_query_metrics)
+from middleware.pet_decay import PetDecayJob, run_decay_job
+from middleware.pet_events import pet_events
+from middleware.profiler import ProfilerMiddleware
+from middleware.read_your_writes import ReadYourWritesMiddleware
+from middleware.threshold_scheduler import (ThresholdScheduler, WebhookHook,
+                                            run_threshold_scheduler)
+from routes.auth import password_hasher
 from routes.auth import router as auth_router
+from routes.metrics import router as metrics_router
 from routes.pets import router as pets_router
+from utils.leader import create_leader_lock
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     async with async_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+    if action_buffer.enabled:
+        action_buffer.start(async_session)
+    await pet_events.start()
+
+    background = []
+
+    if decay_config.ENABLED:
+        job = PetDecayJob(
+            async_session,
+            chunk_size=decay_config.CHUNK_SIZE,
+            time_budget=decay_config.TIME_BUDGET_SECONDS,
+        )
+        if threshold_events_config.WEBHOOK_URL:
+            # the scheduler may run on another worker, it hears of it through pet_events
+            job.listeners.append(pet_events.publish_decayed)
+        leader = create_leader_lock(async_engine, "pet-decay", decay_config.LOCK_DIR)
+        background.append(
+            asyncio.create_task(
+                run_decay_job(job, decay_config.INTERVAL_SECONDS, leader)
+            )
+        )
+
+    if retention_config.ENABLED:
+        job = ActionRetentionJob(
+            async_session,
+            action_archive,
+            retention=timedelta(days=retention_config.RETENTION_DAYS),
+            batch_size=retention_config.BATCH_SIZE,
+            time_budget=retention_config.TIME_BUDGET_SECONDS,
+        )
+        leader = create_leader_lock(
+            async_engine, "action-retention", decay_config.LOCK_DIR
+        )
+        background.append(
+            asyncio.create_task(
+                run_retention_job(job, retention_config.INTERVAL_SECONDS, leader)
+            )
+        )
+
+    if async_engine.dialect.name == "postgresql":
+        job = ActionPartitionJob(async_session, partition_config.MONTHS_AHEAD)
+        leader = create_leader_lock(
+            async_engine, "action-partitions", decay_config.LOCK_DIR
+        )
+        background.append(
+            asyncio.create_task(
+                run_partition_job(job, partition_config.INTERVAL_SECONDS, leader)
+            )
+        )
+
+    scheduler = None
+    if threshold_events_config.WEBHOOK_URL:
+        if pet_events_config.BACKEND != "postgres":
+            # the scheduler follows the states published by its own worker only
+            logger.error(
+                "THRESHOLD_WEBHOOK_URL is set but PET_EVENTS_BACKEND is %r: "
+                "actions served by other workers will not reschedule threshold "
+                "events, set PET_EVENTS_BACKEND=postgres when running several",
+                pet_events_config.BACKEND,
+            )
+        scheduler = ThresholdScheduler(
+            async_session,
+            WebhookHook(
+                threshold_events_config.WEBHOOK_URL,
+                threshold_events_config.WEBHOOK_TIMEOUT_SECONDS,
+            ),
+            chunk_size=threshold_events_config.CHUNK_SIZE,
+        )
+        pet_events.listeners.append(scheduler.update)
+        leader = create_leader_lock(
+            async_engine, "threshold-events", decay_config.LOCK_DIR
+        )
+        background.append(
+            asyncio.create_task(
+                run_threshold_scheduler(
+                    scheduler, threshold_events_config.LEADER_CHECK_SECONDS, leader
+                )
+            )
+        )
+
     yield
+
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    if scheduler is not None:
+        pet_events.listeners.remove(scheduler.update)
+        await scheduler.close()
+    await action_buffer.close()
+    await pet_events.close()
+    password_hasher.shutdown()
+    for engine in read_router.engines:
+        await engine.dispose()
     await async_engine.dispose()
 
 
@@ -30,6 +149,35 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-app.add_middleware(PetDecayMiddleware)
+if read_router.engines:
+    app.add_middleware(
+        ReadYourWritesMiddleware, window=db_config.READ_YOUR_WRITES_SECONDS
+    )
+
+if profiler_config.ENABLED:
+    app.add_middleware(
+        ProfilerMiddleware,
+        output_dir=profiler_config.OUTPUT_DIR,
+        sample_rate=profiler_config.SAMPLE_RATE,
+        slow_ms=profiler_config.SLOW_MS,
+        interval_ms=profiler_config.INTERVAL_MS,
+    )
+
+if metrics_config.ENABLED:
+    register_query_metrics()
+    register_pool_metrics(
+        {
+            "primary": async_engine,
+            **{
+                f"replica{index}": engine
+                for index, engine in enumerate(read_router.engines)
+            },
+        }
+    )
+    register_hasher_metrics(password_hasher)
+    # outermost, so the time spent in the other middleware is included
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
 app.include_router(auth_router)
 app.include_router(pets_router)
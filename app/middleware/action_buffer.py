@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from configs.configactions import action_buffer_config
+from database.action_stats import increment_action_stats
+from database.models import Pet, PetActions
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MEMORY = "memory"
+DURABILITY_FLUSH = "flush"
+
+FLUSH_ATTEMPTS = 3
+
+
+class Submission:
+    """Completion of one ``submit`` with ``flush`` durability.
+
+    Its records may be split across batches; it is done once every one of
+    them is written, or as soon as one of them fails.
+    """
+
+    __slots__ = ("future", "remaining")
+
+    def __init__(self, count: int):
+        self.future = asyncio.get_running_loop().create_future()
+        self.remaining = count
+
+    def written(self):
+        self.remaining -= 1
+        if self.remaining == 0 and not self.future.done():
+            self.future.set_result(None)
+
+    def failed(self, error: BaseException):
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class ActionWriteBuffer:
+    """Write-behind queue for ``PetActions`` rows, flushed in bulk by one task.
+
+    A batch is written once ``batch_size`` records are waiting or the oldest one
+    has waited ``flush_interval`` seconds. With ``memory`` durability a record is
+    acknowledged as soon as it is queued and is lost if the process dies before
+    the flush; with ``flush`` durability ``submit`` returns after the commit,
+    which still lets concurrent requests share one insert.
+
+    Rows of pets deleted before the flush are left out of the batch rather
+    than failing it, as the cascade would have removed them anyway.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        durability: str = DURABILITY_MEMORY,
+    ):
+        if durability not in (DURABILITY_MEMORY, DURABILITY_FLUSH):
+            raise ValueError(f"Unknown action buffer durability: {durability}")
+
+        self.enabled = enabled
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+
+        self.flushed_total = 0
+        self.flushes_total = 0
+        self.failed_total = 0
+        self.discarded_total = 0
+        self.flush_seconds_total = 0.0
+        self.last_flush_seconds = 0.0
+
+        self.session_factory = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self, session_factory):
+        self.session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, records: list[dict]):
+        """Queue action rows, waiting for room when the buffer is full."""
+        submission = None
+        if self.durability == DURABILITY_FLUSH and records:
+            submission = Submission(len(records))
+
+        for record in records:
+            await self._queue.put((record, submission))
+
+        if submission is not None:
+            await submission.future
+
+    async def close(self):
+        """Stop the flusher once everything queued so far is written."""
+        if self._task is None:
+            return
+
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        discarded = []
+
+        # callers with flush durability wait through failed attempts too
+        started = time.perf_counter()
+        error = None
+        attempt = 0
+        while True:
+            records = [record for record, _ in batch]
+            try:
+                async with self.session_factory() as db:
+                    await write_actions(db, records)
+                    await increment_action_stats(db, records)
+                    await db.commit()
+                error = None
+                break
+            except Exception as exc:
+                error = exc
+                logger.warning(
+                    "flushing %d actions failed (attempt %d)", len(records), attempt + 1
+                )
+
+            if isinstance(error, IntegrityError):
+                existing = await self._existing_pets(batch)
+                orphans = [item for item in batch if item[0]["pet_id"] not in existing]
+                if orphans:
+                    # retry right away without the rows of deleted pets; the
+                    # batch shrinks every time, so this does not use up attempts
+                    discarded.extend(orphans)
+                    batch = [item for item in batch if item[0]["pet_id"] in existing]
+                    if not batch:
+                        error = None
+                        break
+                    continue
+
+            attempt += 1
+            if attempt == FLUSH_ATTEMPTS:
+                break
+            await asyncio.sleep(0.5 * attempt)
+
+        elapsed = time.perf_counter() - started
+        self.flushes_total += 1
+        self.last_flush_seconds = elapsed
+        self.flush_seconds_total += elapsed
+
+        if discarded:
+            self.discarded_total += len(discarded)
+            logger.info("discarding %d actions of deleted pets", len(discarded))
+        if error is None:
+            self.flushed_total += len(batch)
+        else:
+            self.failed_total += len(batch)
+            logger.error("dropping %d buffered actions", len(batch), exc_info=error)
+
+        for _, submission in discarded:
+            if submission is not None:
+                submission.written()
+        for _, submission in batch:
+            if submission is None:
+                continue
+            if error is None:
+                submission.written()
+            else:
+                submission.failed(error)
+
+    async def _existing_pets(self, batch: list) -> set[int]:
+        pet_ids = {record["pet_id"] for record, _ in batch}
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(select(Pet.id).where(Pet.id.in_(pet_ids)))
+                return set(result.scalars().all())
+        except Exception:
+            logger.warning(
+                "could not look up the pets of a failed flush", exc_info=True
+            )
+            return pet_ids
+
+
+async def write_actions(db, records: list[dict]):
+    """Bulk-insert action rows, through ``COPY`` on Postgres."""
+    if db.bind.dialect.name == "postgresql":
+        conn = await db.connection()
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            PetActions.__tablename__,
+            columns=["pet_id", "action_type", "timestamp"],
+            records=[
+                (record["pet_id"], record["action_type"].name, record["timestamp"])
+                for record in records
+            ],
+        )
+    else:
+        await db.execute(insert(PetActions), records)
+
+
+action_buffer = ActionWriteBuffer(
+    enabled=action_buffer_config.ENABLED,
+    max_size=action_buffer_config.MAX_SIZE,
+    batch_size=action_buffer_config.BATCH_SIZE,
+    flush_interval=action_buffer_config.FLUSH_INTERVAL_SECONDS,
+    durability=action_buffer_config.DURABILITY,
+)
@@ -0,0 +1,39 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from database.action_partitions import create_partitions, is_partitioned
+from utils.leader import run_as_leader
+
+logger = logging.getLogger(__name__)
+
+
+class ActionPartitionJob:
+    """Creates the ``pet_actions`` partitions for the coming months ahead of time.
+
+    Inserts into a month without a partition fail, so the job runs once at
+    startup and then well within a month. Without partitioning it does nothing.
+    """
+
+    def __init__(self, session_factory, months_ahead: int):
+        self.session_factory = session_factory
+        self.months_ahead = months_ahead
+
+    async def run_tick(self, now: Optional[datetime] = None) -> list[str]:
+        async with self.session_factory() as db:
+            if not await is_partitioned(db):
+                return []
+
+            created = await create_partitions(
+                db, now or datetime.now(timezone.utc), self.months_ahead
+            )
+            await db.commit()
+
+        if created:
+            logger.info("created pet_actions partitions: %s", ", ".join(created))
+
+        return created
+
+
+async def run_partition_job(job: ActionPartitionJob, interval: float, leader=None):
+    await run_as_leader("action partitions", job.run_tick, interval, leader)
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from configs.configretention import retention_config
+from database.action_archive import ActionArchive
+from database.action_partitions import (detach_partition, is_partitioned,
+                                        list_partitions, next_month)
+from database.models import PetActions
+from utils.leader import run_as_leader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionTickReport:
+    rows: int
+    batches: int
+    duration: float
+    completed: bool
+
+
+class ActionRetentionJob:
+    """Moves actions older than ``retention`` from ``pet_actions`` into the archive.
+
+    Each batch is the next ``batch_size`` old actions in id order: they are
+    written to the archive and fsynced before the same id range is deleted, so
+    a crash can at worst archive a batch twice (reads skip duplicates). On a
+    partitioned table, months older than the cutoff are detached instead.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        archive: ActionArchive,
+        retention: timedelta,
+        batch_size: int,
+        time_budget: float,
+    ):
+        self.session_factory = session_factory
+        self.archive = archive
+        self.retention = retention
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+        self.last_report: Optional[RetentionTickReport] = None
+        # last archived id of partitions whose archival ran out of time
+        self.partition_progress: dict[datetime, int] = {}
+
+    async def fetch_batch(self, db, *criteria) -> list:
+        result = await db.execute(
+            select(
+                PetActions.id,
+                PetActions.pet_id,
+                PetActions.action_type,
+                PetActions.timestamp,
+            )
+            .where(*criteria)
+            .order_by(PetActions.id)
+            .limit(self.batch_size)
+        )
+        return result.all()
+
+    async def run_tick(self, now: Optional[datetime] = None) -> RetentionTickReport:
+        started = time.perf_counter()
+        cutoff = (now or datetime.now(timezone.utc)) - self.retention
+
+        rows = batches = 0
+        completed = False
+
+        def out_of_time():
+            return time.perf_counter() - started >= self.time_budget
+
+        async with self.session_factory() as db:
+            if await is_partitioned(db):
+                # months that are entirely past the cutoff are archived and
+                # then detached whole instead of being deleted row by row
+                for month in await list_partitions(db):
+                    if next_month(month) > cutoff or out_of_time():
+                        break
+
+                    while not out_of_time():
+                        last_id = self.partition_progress.get(month, 0)
+                        batch = await self.fetch_batch(
+                            db,
+                            PetActions.timestamp >= month,
+                            PetActions.timestamp < next_month(month),
+                            PetActions.id > last_id,
+                        )
+                        if not batch:
+                            await detach_partition(db, month)
+                            await db.commit()
+                            self.partition_progress.pop(month, None)
+                            break
+
+                        await asyncio.to_thread(self.archive.append, batch)
+                        await db.commit()
+                        self.partition_progress[month] = batch[-1].id
+                        rows += len(batch)
+                        batches += 1
+
+            while not out_of_time():
+                batch = await self.fetch_batch(db, PetActions.timestamp < cutoff)
+                if not batch:
+                    completed = True
+                    break
+
+                await asyncio.to_thread(self.archive.append, batch)
+
+                await db.execute(
+                    delete(PetActions).where(
+                        PetActions.id >= batch[0].id,
+                        PetActions.id <= batch[-1].id,
+                        PetActions.timestamp < cutoff,
+                    )
+                )
+                await db.commit()
+
+                rows += len(batch)
+                batches += 1
+
+        self.last_report = RetentionTickReport(
+            rows=rows,
+            batches=batches,
+            duration=time.perf_counter() - started,
+            completed=completed,
+        )
+
+        logger.info(
+            "action retention tick: archived %d rows in %d batches, %.3fs",
+            rows,
+            batches,
+            self.last_report.duration,
+        )
+
+        return self.last_report
+
+
+async def run_retention_job(job: ActionRetentionJob, interval: float, leader=None):
+    await run_as_leader("action retention", job.run_tick, interval, leader)
+
+
+action_archive: Optional[ActionArchive] = None
+if retention_config.ENABLED:
+    action_archive = ActionArchive(retention_config.ARCHIVE_DIR)
@@ -0,0 +1,195 @@
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from utils.db_pool import pool_snapshot
+from utils.metrics import metrics
+from utils.password_hasher import PasswordHasher
+from utils.query_recorder import instrument_engines, statement_listeners
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# metric name, kind, pool_snapshot key, help
+POOL_METRICS = (
+    ("tamago_db_pool_size", "gauge", "size", "Connections the pool keeps open"),
+    (
+        "tamago_db_pool_checked_out",
+        "gauge",
+        "checked_out",
+        "Connections currently in use",
+    ),
+    (
+        "tamago_db_pool_overflow",
+        "gauge",
+        "overflow",
+        "Connections open beyond the pool size, negative while below it",
+    ),
+    (
+        "tamago_db_pool_checkouts_total",
+        "counter",
+        "checkouts",
+        "Connections handed out",
+    ),
+    (
+        "tamago_db_pool_timeouts_total",
+        "counter",
+        "timeouts",
+        "Checkouts that gave up waiting for a connection",
+    ),
+    (
+        "tamago_db_pool_wait_seconds_total",
+        "counter",
+        "wait_seconds_total",
+        "Time spent waiting for a connection",
+    ),
+    (
+        "tamago_db_pool_hold_seconds_total",
+        "counter",
+        "hold_seconds_total",
+        "Time connections spent checked out",
+    ),
+)
+
+http_requests = metrics.counter(
+    "tamago_http_requests_total",
+    "HTTP requests by route template and status",
+    labels=("method", "route", "status"),
+)
+http_duration = metrics.histogram(
+    "tamago_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    labels=("method", "route"),
+)
+request_queries = metrics.histogram(
+    "tamago_http_request_db_queries",
+    "SQL statements executed per request",
+    buckets=QUERY_COUNT_BUCKETS,
+    labels=("method", "route"),
+)
+request_query_seconds = metrics.histogram(
+    "tamago_http_request_db_seconds",
+    "Time spent executing SQL statements per request",
+    labels=("method", "route"),
+)
+query_duration = metrics.histogram(
+    "tamago_db_query_duration_seconds",
+    "Execution time of single SQL statements, in requests and background jobs",
+    buckets=QUERY_BUCKETS,
+)
+
+
+class RequestQueries:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# statements executed by the current request; None outside of requests
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar(
+    "current_queries", default=None
+)
+
+
+def observe_statement(statement: str, seconds: float):
+    query_duration.observe(seconds)
+
+    queries = current_queries.get()
+    if queries is not None:
+        queries.count += 1
+        queries.seconds += seconds
+
+
+def register_query_metrics():
+    if observe_statement not in statement_listeners:
+        statement_listeners.append(observe_statement)
+    instrument_engines()
+
+
+def unregister_query_metrics():
+    if observe_statement in statement_listeners:
+        statement_listeners.remove(observe_statement)
+
+
+def register_pool_metrics(engines: dict[str, AsyncEngine]):
+    """Expose ``pool_snapshot`` of each engine, labelled with its name."""
+
+    def reader(key: str):
+        def read():
+            values = {}
+            for name, engine in engines.items():
+                snapshot = pool_snapshot(engine)
+                if key in snapshot:
+                    values[(name,)] = snapshot[key]
+            return values
+
+        return read
+
+    for metric, kind, key, help in POOL_METRICS:
+        metrics.callback(metric, help, kind, reader(key), labels=("engine",))
+
+
+def register_hasher_metrics(hasher: PasswordHasher):
+    metrics.callback(
+        "tamago_password_hash_pending",
+        "bcrypt hashes running or waiting for a worker",
+        "gauge",
+        lambda: hasher.pending,
+    )
+    metrics.callback(
+        "tamago_password_hash_total",
+        "bcrypt hashes and checks that completed without an error",
+        "counter",
+        lambda: hasher.completed,
+    )
+    metrics.callback(
+        "tamago_password_hash_seconds_total",
+        "Time the workers spent in bcrypt hashes and checks, queueing left out",
+        "counter",
+        lambda: hasher.busy_seconds,
+    )
+
+
+class MetricsMiddleware:
+    """Counts and times requests per route template, with their SQL statements.
+
+    Routes are labelled by their template, e.g. ``/pets/{pet_id}``, so series
+    stay bounded; requests no route matched share the ``unmatched`` label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_queries.reset(token)
+
+            # the router stores the matched route in the scope
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"))
+            http_requests.inc(labels=(*labels, str(status)))
+            http_duration.observe(elapsed, labels)
+            request_queries.observe(queries.count, labels)
+            request_query_seconds.observe(queries.seconds, labels)
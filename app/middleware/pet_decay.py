@@ -1,45 +1,273 @@
-from datetime import datetime, timezone
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Mapping, Optional
 
-from fastapi import Request
-from sqlalchemy import select
-from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy import DateTime, case, func, literal, select, update
 
-from configs.configdb import async_session
+from database.functions import (add_minutes, floor_int, greatest, least,
+                                minutes_between)
 from database.models import Pet
+from utils.leader import run_as_leader
+from utils.metrics import metrics
 
+logger = logging.getLogger(__name__)
 
-class PetDecayMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        async with async_session() as db:
-            result = await db.execute(select(Pet))
-            pets = result.scalars().all()
+DECAY_PER_MINUTE = 0.5
+MAX_DECAY = 50
 
-            now = datetime.now(timezone.utc)
+PET_STATS = ("hunger", "energy", "happiness")
 
-            for pet in pets:
-                last_updated = pet.last_updated
+# stat levels whose crossing is pushed to the owner
+STAT_THRESHOLDS = (50, 20, 0)
 
-                if last_updated.tzinfo is None:
-                    last_updated = last_updated.replace(tzinfo=timezone.utc)
+# a pet needs attention once its lowest stat is down to this level
+CRITICAL_LEVEL = 20
 
-                elapsed_seconds = (now - last_updated).total_seconds()
-                if elapsed_seconds <= 0:
-                    continue
+# critical_at of pets whose lowest stat is more than MAX_DECAY above the level:
+# decay from their stored state never gets there, and this sorts after any real time
+NEVER_CRITICAL = datetime(9999, 12, 31, tzinfo=timezone.utc)
 
-                elapsed_minutes = elapsed_seconds / 60
-                decay_per_minute = 0.5
-                max_decay = 50
+decay_ticks = metrics.counter("tamago_decay_ticks_total", "Decay job ticks run")
+decay_rows = metrics.counter("tamago_decay_rows_total", "Pets updated by the decay job")
+decay_seconds = metrics.counter(
+    "tamago_decay_seconds_total", "Time the decay job spent in its ticks"
+)
 
-                decay = min(decay_per_minute * elapsed_minutes, max_decay)
 
-                pet.hunger = int(max(pet.hunger - decay, 0))
-                pet.energy = int(max(pet.energy - decay, 0))
-                pet.happiness = int(max(pet.happiness - decay, 0))
+def as_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
 
-                pet.last_updated = now
-                db.add(pet)
 
-            await db.commit()
+def calculate_decay(last_updated: datetime, now: datetime) -> tuple[int, datetime]:
+    """Return the whole decay points accrued since ``last_updated`` and the new anchor.
 
-        response = await call_next(request)
-        return response
+    Only whole points are consumed: the anchor moves forward by exactly the time
+    those points took, so the fractional remainder keeps accruing instead of being
+    truncated away. Once ``MAX_DECAY`` is reached the anchor jumps to ``now``.
+    """
+    last_updated = as_utc(last_updated)
+
+    elapsed_minutes = (now - last_updated).total_seconds() / 60
+    if elapsed_minutes <= 0:
+        return 0, last_updated
+
+    decay = DECAY_PER_MINUTE * elapsed_minutes
+    if decay >= MAX_DECAY:
+        return MAX_DECAY, now
+
+    points = math.floor(decay)
+    return points, last_updated + timedelta(minutes=points / DECAY_PER_MINUTE)
+
+
+def decay_stats(
+    stats: dict[str, int], last_updated: datetime, now: datetime
+) -> tuple[dict[str, int], datetime]:
+    points, anchor = calculate_decay(last_updated, now)
+    return {name: max(value - points, 0) for name, value in stats.items()}, anchor
+
+
+def apply_decay(pet, now: Optional[datetime] = None):
+    """Bring an ORM ``Pet`` up to date in memory; it is persisted only if the session commits."""
+    now = now or datetime.now(timezone.utc)
+
+    stats, anchor = decay_stats(
+        {name: getattr(pet, name) for name in PET_STATS}, pet.last_updated, now
+    )
+    if anchor == as_utc(pet.last_updated):
+        return pet
+
+    for name, value in stats.items():
+        setattr(pet, name, value)
+    pet.last_updated = anchor
+    pet.critical_at = critical_at(stats, anchor)
+
+    return pet
+
+
+def decay_row(row: Mapping, now: Optional[datetime] = None) -> dict:
+    """``apply_decay`` for a pet selected as columns; returns a decayed dict copy."""
+    pet = dict(row)
+
+    stats, anchor = decay_stats(
+        {name: pet[name] for name in PET_STATS},
+        pet["last_updated"],
+        now or datetime.now(timezone.utc),
+    )
+    if anchor != as_utc(pet["last_updated"]):
+        pet.update(stats, last_updated=anchor)
+
+    return pet
+
+
+def critical_at(stats: dict[str, int], last_updated: datetime) -> datetime:
+    """When the lowest stat decays to ``CRITICAL_LEVEL``; kept in ``pets.critical_at``.
+
+    Extrapolated back into the past for pets already below the level, so that
+    it ranks pets by urgency. Like ``calculate_decay`` it stops at ``MAX_DECAY``:
+    pets that would need more are ``NEVER_CRITICAL``.
+    """
+    points = min(stats.values()) - CRITICAL_LEVEL
+    if points > MAX_DECAY:
+        return NEVER_CRITICAL
+    return as_utc(last_updated) + timedelta(minutes=points / DECAY_PER_MINUTE)
+
+
+def critical_at_value(values: dict):
+    """SQL counterpart of ``critical_at`` over the new values of an ``UPDATE pets``."""
+    points = least(*(values[name] for name in PET_STATS)) - CRITICAL_LEVEL
+    return case(
+        (points > MAX_DECAY, literal(NEVER_CRITICAL, DateTime(timezone=True))),
+        else_=add_minutes(values["last_updated"], points / DECAY_PER_MINUTE),
+    )
+
+
+def threshold_crossings(
+    stats: dict[str, int], last_updated: datetime, after: datetime
+) -> list[tuple[datetime, str, int]]:
+    """When each stat decays to each ``STAT_THRESHOLDS`` level after ``after``.
+
+    Returns ``(moment, stat, level)`` tuples in time order. ``stats`` are the
+    values at ``last_updated``, as stored for a pet; levels more than
+    ``MAX_DECAY`` below a stat are not reached from this anchor.
+    """
+    last_updated = as_utc(last_updated)
+
+    crossings = (
+        (
+            last_updated + timedelta(minutes=(value - level) / DECAY_PER_MINUTE),
+            name,
+            level,
+        )
+        for name, value in stats.items()
+        for level in STAT_THRESHOLDS
+        if 0 < value - level <= MAX_DECAY
+    )
+    return sorted(crossing for crossing in crossings if crossing[0] > after)
+
+
+def next_threshold_crossing(
+    stats: dict[str, int], last_updated: datetime, after: datetime
+) -> Optional[datetime]:
+    crossings = threshold_crossings(stats, last_updated, after)
+    return crossings[0][0] if crossings else None
+
+
+def decay_values(now: datetime) -> dict:
+    """SQL counterpart of ``decay_stats`` for set-based ``UPDATE pets`` statements.
+
+    Callers that change stats on top of the decay recompute ``critical_at``
+    with ``critical_at_value``.
+    """
+    now_param = literal(now, DateTime(timezone=True))
+
+    decay = minutes_between(Pet.last_updated, now_param) * DECAY_PER_MINUTE
+    capped = decay >= MAX_DECAY
+    points = case((capped, MAX_DECAY), else_=floor_int(decay))
+
+    values = {name: greatest(getattr(Pet, name) - points, 0) for name in PET_STATS}
+    values["last_updated"] = case(
+        (capped, now_param),
+        else_=add_minutes(Pet.last_updated, points / DECAY_PER_MINUTE),
+    )
+    values["critical_at"] = critical_at_value(values)
+
+    return values
+
+
+@dataclass
+class DecayTickReport:
+    rows: int
+    chunks: int
+    duration: float
+    completed: bool
+
+
+class PetDecayJob:
+    """Persists decay for every stale pet with one ``UPDATE`` per id-range chunk.
+
+    A tick stops once its time budget is spent and the next tick resumes from
+    the id range where it left off.
+    """
+
+    def __init__(self, session_factory, chunk_size: int, time_budget: float):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.time_budget = time_budget
+        self.next_id: Optional[int] = None
+        self.last_report: Optional[DecayTickReport] = None
+        # called with the [lower, upper) id range of every chunk that had rows
+        # re-anchored, e.g. to let the threshold scheduler re-read them
+        self.listeners: list[Callable[[int, int], None]] = []
+
+    async def run_tick(self, now: Optional[datetime] = None) -> DecayTickReport:
+        started = time.perf_counter()
+        now = now or datetime.now(timezone.utc)
+        # rows anchored later than this have not accrued a whole point yet
+        cutoff = now - timedelta(minutes=1 / DECAY_PER_MINUTE)
+
+        rows = chunks = 0
+        completed = True
+
+        async with self.session_factory() as db:
+            bounds = await db.execute(select(func.min(Pet.id), func.max(Pet.id)))
+            min_id, max_id = bounds.one()
+
+            lower = self.next_id if self.next_id is not None else min_id
+            while max_id is not None and lower <= max_id:
+                upper = lower + self.chunk_size
+                result = await db.execute(
+                    update(Pet)
+                    .where(
+                        Pet.id >= lower,
+                        Pet.id < upper,
+                        Pet.last_updated < cutoff,
+                    )
+                    .values(**decay_values(now))
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+                if result.rowcount:
+                    for listener in self.listeners:
+                        listener(lower, upper)
+
+                rows += result.rowcount
+                chunks += 1
+                lower = upper
+
+                if (
+                    lower <= max_id
+                    and time.perf_counter() - started >= self.time_budget
+                ):
+                    completed = False
+                    break
+
+        self.next_id = None if completed else lower
+        self.last_report = DecayTickReport(
+            rows=rows,
+            chunks=chunks,
+            duration=time.perf_counter() - started,
+            completed=completed,
+        )
+        decay_ticks.inc()
+        decay_rows.inc(rows)
+        decay_seconds.inc(self.last_report.duration)
+
+        logger.info(
+            "pet decay tick: %d rows in %d chunks, %.3fs%s",
+            rows,
+            chunks,
+            self.last_report.duration,
+            "" if completed else " (time budget spent, resuming next tick)",
+        )
+
+        return self.last_report
+
+
+async def run_decay_job(job: PetDecayJob, interval: float, leader=None):
+    await run_as_leader("pet decay", job.run_tick, interval, leader)
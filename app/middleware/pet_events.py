@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Callable, Mapping, Optional
+
+from configs.configdb import async_engine
+from configs.configevents import pet_events_config
+from middleware.pet_decay import PET_STATS, decay_row, next_threshold_crossing
+from utils.pubsub import LocalBroker, PostgresBroker
+
+logger = logging.getLogger(__name__)
+
+PET_FIELDS = ("id", "name", "owner_id", *PET_STATS, "last_updated")
+
+
+class PetChannel:
+    """Everything one worker pushes for one pet, shared by all its subscribers."""
+
+    def __init__(self, state: dict):
+        self.state = state
+        self.subscribers: set[asyncio.Queue] = set()
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PetStateHub:
+    """Pushes pet states to subscribers after actions and at decay thresholds.
+
+    Writers publish the stored state of a pet through the broker; each worker
+    keeps one ``PetChannel`` per pet that has subscribers, so the number of
+    open streams does not add any database work.
+    """
+
+    def __init__(self, broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.channels: dict[int, PetChannel] = {}
+        # called with every published state, e.g. by the threshold scheduler
+        self.listeners: list[Callable[[dict], None]] = []
+
+    async def start(self):
+        await self.broker.start(self.dispatch)
+
+    async def close(self):
+        for channel in self.channels.values():
+            if channel.timer is not None:
+                channel.timer.cancel()
+        self.channels.clear()
+        await self.broker.close()
+
+    def publish(self, pet: Mapping):
+        """Announce the new stored state of a pet (no decay applied)."""
+        message = {field: pet[field] for field in PET_FIELDS}
+        message["last_updated"] = pet["last_updated"].isoformat()
+        self.broker.publish(message)
+
+    def publish_deleted(self, pet_id: int):
+        self.broker.publish({"id": pet_id, "deleted": True})
+
+    def publish_decayed(self, lower: int, upper: int):
+        """Announce that the decay job re-anchored pets with ids in [lower, upper)."""
+        self.broker.publish({"decayed": [lower, upper]})
+
+    def dispatch(self, message: dict):
+        if "decayed" in message:
+            # for the listeners; open streams keep decaying the last published state
+            for listener in self.listeners:
+                listener(message)
+            return
+
+        if not message.get("deleted"):
+            message["last_updated"] = datetime.fromisoformat(message["last_updated"])
+
+        for listener in self.listeners:
+            listener(message)
+
+        channel = self.channels.get(message["id"])
+        if channel is None:
+            return
+
+        if message.get("deleted"):
+            self.end(channel, message)
+            return
+
+        channel.state = message
+        self.push(channel)
+
+    def end(self, channel: PetChannel, message: dict):
+        """Hand the subscribers their last message; the channel is dropped."""
+        if channel.timer is not None:
+            channel.timer.cancel()
+        del self.channels[message["id"]]
+
+        for queue in channel.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    @asynccontextmanager
+    async def subscribe(self, state: Mapping):
+        """Queue of decayed states of the pet, starting with the current one.
+
+        Once the pet is deleted the queue receives ``{"id": ..., "deleted": True}``
+        and nothing after it.
+        """
+        pet_id = state["id"]
+        channel = self.channels.get(pet_id)
+        if channel is None:
+            channel = self.channels[pet_id] = PetChannel(dict(state))
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        channel.subscribers.add(queue)
+        self.push(channel, [queue])
+
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers and self.channels.get(pet_id) is channel:
+                if channel.timer is not None:
+                    channel.timer.cancel()
+                del self.channels[pet_id]
+
+    def push(self, channel: PetChannel, queues=None):
+        now = datetime.now(timezone.utc)
+        # channel.state stays the stored one, so that like a read the pushed
+        # states stop MAX_DECAY below it
+        state = decay_row(channel.state, now)
+
+        for queue in channel.subscribers if queues is None else queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(state)
+
+        self.schedule(channel, now)
+
+    def schedule(self, channel: PetChannel, now: datetime):
+        if channel.timer is not None:
+            channel.timer.cancel()
+            channel.timer = None
+
+        crossing = next_threshold_crossing(
+            {name: channel.state[name] for name in PET_STATS},
+            channel.state["last_updated"],
+            now,
+        )
+        if crossing is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        delay = (crossing - now).total_seconds()
+        channel.timer = loop.call_at(loop.time() + delay, self.push, channel)
+
+
+def create_broker():
+    if pet_events_config.BACKEND == "postgres":
+        return PostgresBroker(async_engine, "pet_state")
+    return LocalBroker()
+
+
+pet_events = PetStateHub(create_broker(), pet_events_config.QUEUE_SIZE)
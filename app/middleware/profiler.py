@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from utils.query_recorder import QueryRecorder
+from utils.stack_sampler import StackSampler, TaskProfile
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerMiddleware:
+    """Profiles a sample of requests and the slow ones, into ``output_dir``.
+
+    A ``sample_rate`` fraction of requests is sampled from start to end;
+    any other request still running after ``slow_ms`` is sampled from that
+    moment on. Each profiled request leaves a ``.folded`` file of wall-clock
+    stacks, viewable as a flame graph, and a ``.json`` file with its SQL
+    statements and their durations. Statements of a request are only kept
+    once it is sampled or slow; until then they are merely counted, so other
+    requests only pay for being registered with the sampler and for that count.
+    """
+
+    def __init__(
+        self,
+        app,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        slow_ms: float = 500.0,
+        interval_ms: float = 5.0,
+    ):
+        self.app = app
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.slow = slow_ms / 1000
+        # slow requests start being sampled at most a tenth of the threshold late
+        poll = max(interval_ms / 1000, self.slow / 10)
+        self.sampler = StackSampler(interval_ms / 1000, poll)
+        self.sequence = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        task = asyncio.current_task()
+        sampled = random.random() < self.sample_rate
+        self.sampler.watch(task, 0 if sampled else self.slow)
+
+        started = time.perf_counter()
+        record_from = started if sampled else started + self.slow
+        try:
+            with QueryRecorder(record_from) as queries:
+                await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            profile = self.sampler.unwatch(task)
+
+        if sampled or elapsed >= self.slow:
+            if profile is None:
+                # finished before the sampler got to it
+                profile = TaskProfile(task)
+            started_at = datetime.now(timezone.utc) - timedelta(seconds=elapsed)
+            route = scope.get("route")
+            report = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(route, "path", None),
+                "status": status,
+                "reason": "sampled" if sampled else "slow",
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(elapsed * 1000, 3),
+                "sample_interval_ms": self.sampler.interval * 1000,
+                "samples": profile.samples,
+                "sql_ms": round(queries.seconds * 1000, 3),
+                "sql_count": len(queries),
+                # statements that finished before the request was found slow
+                "unrecorded_queries": queries.skipped,
+                # parameters are left out, they may hold credentials
+                "queries": [
+                    {
+                        "statement": " ".join(query.statement.split()),
+                        "duration_ms": round(query.seconds * 1000, 3),
+                    }
+                    for query in queries.queries
+                ],
+            }
+            try:
+                await asyncio.to_thread(self.write, report, profile.folded())
+            except OSError:
+                logger.exception("could not write the profile of %s", scope["path"])
+
+    def write(self, report: dict, folded: str) -> Path:
+        route = re.sub(r"[^A-Za-z0-9]+", "_", report["route"] or "unmatched")
+        stem = (
+            f"{report['started_at'][:19].replace(':', '')}-{report['method']}"
+            f"{route.rstrip('_')}-{round(report['duration_ms'])}ms"
+            f"-{os.getpid()}-{next(self.sequence)}"
+        )
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / f"{stem}.folded").write_text(folded)
+        path = self.output_dir / f"{stem}.json"
+        path.write_text(json.dumps(report, indent=2) + "\n")
+        return path
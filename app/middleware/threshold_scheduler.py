@@ -0,0 +1,286 @@
+import asyncio
+import heapq
+import logging
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Mapping, Optional
+
+import httpx
+from sqlalchemy import select
+
+from database.models import Pet
+from middleware.pet_decay import (PET_STATS, as_utc, next_threshold_crossing,
+                                  threshold_crossings)
+
+logger = logging.getLogger(__name__)
+
+TRACKED_FIELDS = ("owner_id", *PET_STATS, "last_updated")
+
+
+@dataclass
+class ThresholdEvent:
+    pet_id: int
+    owner_id: int
+    stat: str
+    level: int
+    at: datetime
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "at": self.at.isoformat()}
+
+
+class WebhookHook:
+    """POSTs every event as JSON to ``url``; failed deliveries are logged and dropped."""
+
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def __call__(self, event: ThresholdEvent):
+        try:
+            response = await self.client.post(self.url, json=event.as_dict())
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            logger.warning("threshold webhook failed for pet %d: %s", event.pet_id, exc)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LocalHook:
+    """Keeps events in a queue, for tests and single-process setups."""
+
+    def __init__(self):
+        self.events: asyncio.Queue = asyncio.Queue()
+
+    async def __call__(self, event: ThresholdEvent):
+        self.events.put_nowait(event)
+
+    async def close(self):
+        pass
+
+
+class ScheduledPet:
+    __slots__ = ("state", "after", "due")
+
+    def __init__(self, state: dict, after: datetime):
+        self.state = state
+        # crossings up to this moment have been emitted or were in the past
+        self.after = after
+        self.due: Optional[datetime] = None
+
+
+class ThresholdScheduler:
+    """Emits an event the moment a pet stat decays to one of ``STAT_THRESHOLDS``.
+
+    Decay is deterministic, so the next crossing of every pet is known in
+    advance and kept in a min-heap; only pets with a crossing ahead are kept.
+    Pets are read once when the scheduler starts (or takes over leadership)
+    and then kept current from the states published through ``pet_events``,
+    and re-read by id range after the decay job re-anchored them; the pets
+    table is never scanned again. Stale heap entries are skipped lazily
+    instead of being removed.
+    """
+
+    def __init__(self, session_factory, hook, chunk_size: int):
+        self.session_factory = session_factory
+        self.hook = hook
+        self.chunk_size = chunk_size
+        self.pets: dict[int, ScheduledPet] = {}
+        self.heap: list[tuple[datetime, int]] = []
+        self.deliveries: set[asyncio.Task] = set()
+        self.wakeup = asyncio.Event()
+        self.active = False
+        self.built = False
+        # pets published while a rebuild reads them; their rows may be older
+        self.published: set[int] = set()
+        # [lower, upper) id ranges re-anchored by the decay job, to re-read
+        self.decayed: deque[tuple[int, int]] = deque()
+        self.columns = [Pet.id, *(getattr(Pet, name) for name in TRACKED_FIELDS)]
+
+    def reset(self):
+        self.pets.clear()
+        self.heap.clear()
+        self.published.clear()
+        self.decayed.clear()
+        self.active = self.built = False
+
+    async def rebuild(self):
+        self.reset()
+        self.active = True
+        now = datetime.now(timezone.utc)
+        last_id = 0
+
+        async with self.session_factory() as db:
+            while True:
+                result = await db.execute(
+                    select(*self.columns)
+                    .where(Pet.id > last_id)
+                    .order_by(Pet.id)
+                    .limit(self.chunk_size)
+                )
+                rows = result.mappings().all()
+                if not rows:
+                    break
+
+                for row in rows:
+                    if row["id"] not in self.published:
+                        self.track(row["id"], row, now)
+                last_id = rows[-1]["id"]
+
+        self.published.clear()
+        self.built = True
+        logger.info("threshold scheduler tracking %d pets", len(self.pets))
+
+    async def reload(self, lower: int, upper: int):
+        """Reschedule the pets with ids in [lower, upper) from their rows."""
+        now = datetime.now(timezone.utc)
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(*self.columns).where(Pet.id >= lower, Pet.id < upper)
+            )
+            rows = result.mappings().all()
+
+        for row in rows:
+            tracked = self.pets.get(row["id"])
+            # crossings already emitted from the old anchor are not emitted again
+            self.track(row["id"], row, tracked.after if tracked else now)
+
+    def update(self, message: dict):
+        """``pet_events`` listener: reschedule a pet from its published state."""
+        if not self.active:
+            return
+
+        if "decayed" in message:
+            self.decayed.append(tuple(message["decayed"]))
+            self.wakeup.set()
+            return
+
+        pet_id = message["id"]
+        if not self.built:
+            self.published.add(pet_id)
+
+        if message.get("deleted"):
+            self.pets.pop(pet_id, None)
+            return
+
+        self.track(pet_id, message, datetime.now(timezone.utc))
+
+    def track(self, pet_id: int, state: Mapping, now: datetime):
+        state = {field: state[field] for field in TRACKED_FIELDS}
+        state["last_updated"] = as_utc(state["last_updated"])
+
+        self.schedule(pet_id, ScheduledPet(state, now))
+
+    def schedule(self, pet_id: int, pet: ScheduledPet):
+        pet.due = next_threshold_crossing(
+            {name: pet.state[name] for name in PET_STATS},
+            pet.state["last_updated"],
+            pet.after,
+        )
+        if pet.due is None:
+            # nothing to emit until the pet gets a new state or anchor
+            self.pets.pop(pet_id, None)
+            return
+
+        self.pets[pet_id] = pet
+
+        if not self.heap or pet.due < self.heap[0][0]:
+            self.wakeup.set()
+        heapq.heappush(self.heap, (pet.due, pet_id))
+
+        if len(self.heap) > 2 * len(self.pets) + 1024:
+            self.heap = [(pet.due, i) for i, pet in self.pets.items()]
+            heapq.heapify(self.heap)
+
+    def fire_due(self, now: datetime) -> int:
+        fired = 0
+
+        while self.heap and self.heap[0][0] <= now:
+            due, pet_id = heapq.heappop(self.heap)
+            pet = self.pets.get(pet_id)
+            if pet is None or pet.due != due:
+                continue
+
+            for moment, stat, level in threshold_crossings(
+                {name: pet.state[name] for name in PET_STATS},
+                pet.state["last_updated"],
+                pet.after,
+            ):
+                if moment > now:
+                    break
+                self.emit(
+                    ThresholdEvent(pet_id, pet.state["owner_id"], stat, level, moment)
+                )
+                fired += 1
+
+            # decay is not re-anchored here: reads stop MAX_DECAY below the
+            # stored state, and so do the crossings until a new state is published
+            pet.after = now
+            self.schedule(pet_id, pet)
+
+        return fired
+
+    def emit(self, event: ThresholdEvent):
+        task = asyncio.create_task(self.hook(event))
+        self.deliveries.add(task)
+        task.add_done_callback(self.deliveries.discard)
+
+    async def run_for(self, duration: float):
+        """Fire crossings as they fall due for ``duration`` seconds."""
+        if not self.built:
+            await self.rebuild()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+
+        while True:
+            while self.decayed:
+                await self.reload(*self.decayed.popleft())
+
+            now = datetime.now(timezone.utc)
+            self.fire_due(now)
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return
+            if self.heap:
+                timeout = min(timeout, (self.heap[0][0] - now).total_seconds())
+
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        await asyncio.gather(*self.deliveries, return_exceptions=True)
+        await self.hook.close()
+
+
+async def run_threshold_scheduler(
+    scheduler: ThresholdScheduler, interval: float, leader=None
+):
+    """Run ``scheduler`` while holding ``leader``, re-checking it every ``interval``.
+
+    Unlike ``run_as_leader`` the leader does not sleep between windows, so no
+    crossing is fired late; followers drop their state until they take over.
+    """
+    try:
+        while True:
+            try:
+                if leader is None or await leader.acquire():
+                    await scheduler.run_for(interval)
+                    continue
+                scheduler.reset()
+            except Exception:
+                logger.exception("threshold scheduler failed")
+                scheduler.reset()
+
+            await asyncio.sleep(interval)
+    finally:
+        scheduler.reset()
+        if leader is not None:
+            await leader.release()
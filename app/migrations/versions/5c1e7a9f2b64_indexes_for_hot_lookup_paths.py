@@ -0,0 +1,69 @@
+"""Indexes for hot lookup paths
+
+Revision ID: 5c1e7a9f2b64
+Revises: 3ace290d61b0
+Create Date: 2026-10-18 13:40:12.418220
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e7a9f2b64"
+down_revision: Union[str, Sequence[str], None] = "3ace290d61b0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so existing tables stay writable while indexing;
+    # fails on duplicate usernames, which have to be cleaned up first
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_username",
+            "users",
+            ["username"],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_pets_owner_id_id",
+            "pets",
+            ["owner_id", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_pets_owner_id_name",
+            "pets",
+            ["owner_id", "name"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_pet_actions_pet_id_timestamp",
+            "pet_actions",
+            ["pet_id", sa.text("timestamp DESC")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_pet_actions_pet_id_timestamp",
+            table_name="pet_actions",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_pets_owner_id_name", table_name="pets", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_pets_owner_id_id", table_name="pets", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_users_username", table_name="users", postgresql_concurrently=True
+        )
@@ -0,0 +1,50 @@
+"""Keyset index for actions history
+
+Revision ID: 9e4b2d7c1a35
+Revises: 5c1e7a9f2b64
+Create Date: 2026-10-18 14:05:37.902114
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9e4b2d7c1a35"
+down_revision: Union[str, Sequence[str], None] = "5c1e7a9f2b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_pet_actions_pet_id_timestamp_id",
+            "pet_actions",
+            ["pet_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_pet_actions_pet_id_timestamp",
+            table_name="pet_actions",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_pet_actions_pet_id_timestamp",
+            "pet_actions",
+            ["pet_id", sa.text("timestamp DESC")],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_pet_actions_pet_id_timestamp_id",
+            table_name="pet_actions",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,68 @@
+"""Pet critical_at
+
+Revision ID: a8e3d5b1c7f9
+Revises: f4c1b9e7a2d6
+Create Date: 2026-10-18 16:05:44.210934
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a8e3d5b1c7f9"
+down_revision: Union[str, Sequence[str], None] = "f4c1b9e7a2d6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "pets", sa.Column("critical_at", sa.DateTime(timezone=True), nullable=True)
+    )
+    # same formula as middleware.pet_decay.critical_at: the lowest stat falls
+    # by DECAY_PER_MINUTE = 0.5 until it reaches CRITICAL_LEVEL = 20, unless
+    # that takes more than MAX_DECAY = 50 points (NEVER_CRITICAL)
+    op.execute(
+        """
+        UPDATE pets
+        SET critical_at = CASE
+            WHEN LEAST(hunger, energy, happiness) - 20 > 50
+                THEN TIMESTAMPTZ '9999-12-31 00:00:00+00'
+            ELSE last_updated
+                + (LEAST(hunger, energy, happiness) - 20) / 0.5 * INTERVAL '1 minute'
+        END
+        """
+    )
+    op.alter_column("pets", "critical_at", nullable=False)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_pets_critical_at_id",
+            "pets",
+            ["critical_at", "id"],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_pets_owner_id_critical_at_id",
+            "pets",
+            ["owner_id", "critical_at", "id"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_pets_owner_id_critical_at_id",
+            table_name="pets",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_pets_critical_at_id", table_name="pets", postgresql_concurrently=True
+        )
+    op.drop_column("pets", "critical_at")
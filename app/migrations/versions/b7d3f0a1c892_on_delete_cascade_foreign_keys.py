@@ -0,0 +1,61 @@
+"""ON DELETE CASCADE foreign keys
+
+Revision ID: b7d3f0a1c892
+Revises: 9e4b2d7c1a35
+Create Date: 2026-10-18 14:40:51.226419
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d3f0a1c892"
+down_revision: Union[str, Sequence[str], None] = "9e4b2d7c1a35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NOT VALID skips the check of the existing rows, which would hold the
+    # table locks for as long as a scan of pet_actions takes
+    op.drop_constraint("pets_owner_id_fkey", "pets", type_="foreignkey")
+    op.create_foreign_key(
+        "pets_owner_id_fkey",
+        "pets",
+        "users",
+        ["owner_id"],
+        ["id"],
+        ondelete="CASCADE",
+        postgresql_not_valid=True,
+    )
+    op.drop_constraint("pet_actions_pet_id_fkey", "pet_actions", type_="foreignkey")
+    op.create_foreign_key(
+        "pet_actions_pet_id_fkey",
+        "pet_actions",
+        "pets",
+        ["pet_id"],
+        ["id"],
+        ondelete="CASCADE",
+        postgresql_not_valid=True,
+    )
+
+    # validated in their own transactions, which lets writes go on meanwhile
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE pets VALIDATE CONSTRAINT pets_owner_id_fkey")
+        op.execute(
+            "ALTER TABLE pet_actions VALIDATE CONSTRAINT pet_actions_pet_id_fkey"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("pet_actions_pet_id_fkey", "pet_actions", type_="foreignkey")
+    op.create_foreign_key(
+        "pet_actions_pet_id_fkey", "pet_actions", "pets", ["pet_id"], ["id"]
+    )
+    op.drop_constraint("pets_owner_id_fkey", "pets", type_="foreignkey")
+    op.create_foreign_key("pets_owner_id_fkey", "pets", "users", ["owner_id"], ["id"])
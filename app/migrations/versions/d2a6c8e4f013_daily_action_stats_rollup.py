@@ -0,0 +1,44 @@
+"""Daily action stats rollup
+
+Revision ID: d2a6c8e4f013
+Revises: b7d3f0a1c892
+Create Date: 2026-10-18 15:12:03.551870
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "d2a6c8e4f013"
+down_revision: Union[str, Sequence[str], None] = "b7d3f0a1c892"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "pet_action_daily",
+        sa.Column("pet_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column(
+            "action_type",
+            postgresql.ENUM(
+                "FEED", "PLAY", "SLEEP", name="actiontype", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["pet_id"], ["pets.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("pet_id", "day", "action_type"),
+    )
+    # fill it with: python -m scripts.backfill_action_stats
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("pet_action_daily")
@@ -0,0 +1,130 @@
+"""Partition pet_actions by month
+
+Revision ID: f4c1b9e7a2d6
+Revises: d2a6c8e4f013
+Create Date: 2026-10-18 16:05:37.218904
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4c1b9e7a2d6"
+down_revision: Union[str, Sequence[str], None] = "d2a6c8e4f013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# partitions created past the current month; the app keeps this many ahead
+MONTHS_AHEAD = 3
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # copies every action into the new table: run it in a maintenance window
+    op.execute("ALTER TABLE pet_actions RENAME TO pet_actions_unpartitioned")
+    op.execute(
+        "ALTER TABLE pet_actions_unpartitioned "
+        "RENAME CONSTRAINT pet_actions_pkey TO pet_actions_unpartitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_pet_actions_pet_id_timestamp_id "
+        "RENAME TO ix_pet_actions_unpartitioned_pet_id_timestamp_id"
+    )
+    op.execute("ALTER SEQUENCE pet_actions_id_seq OWNED BY NONE")
+
+    # the partition key has to be part of the primary key
+    op.execute(
+        """
+        CREATE TABLE pet_actions (
+            id integer NOT NULL DEFAULT nextval('pet_actions_id_seq'),
+            pet_id integer NOT NULL,
+            action_type actiontype NOT NULL,
+            "timestamp" timestamp with time zone NOT NULL,
+            CONSTRAINT pet_actions_pkey PRIMARY KEY (id, "timestamp"),
+            CONSTRAINT pet_actions_pet_id_fkey FOREIGN KEY (pet_id)
+                REFERENCES pets (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    op.execute("ALTER SEQUENCE pet_actions_id_seq OWNED BY pet_actions.id")
+
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month timestamp := date_trunc('month', coalesce(
+                (SELECT min("timestamp") FROM pet_actions_unpartitioned), now()
+            ) AT TIME ZONE 'UTC');
+            last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC')
+                + interval '{MONTHS_AHEAD} months';
+        BEGIN
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF pet_actions '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'pet_actions_' || to_char(month, 'YYYY_MM'),
+                    month AT TIME ZONE 'UTC',
+                    (month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+                month := month + interval '1 month';
+            END LOOP;
+        END $$
+        """
+    )
+
+    op.execute(
+        'INSERT INTO pet_actions (id, pet_id, action_type, "timestamp") '
+        'SELECT id, pet_id, action_type, "timestamp" FROM pet_actions_unpartitioned'
+    )
+    op.drop_table("pet_actions_unpartitioned")
+
+    # created on the parent, so every partition gets its own copy
+    op.create_index(
+        "ix_pet_actions_pet_id_timestamp_id",
+        "pet_actions",
+        ["pet_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("ALTER TABLE pet_actions RENAME TO pet_actions_partitioned")
+    op.execute(
+        "ALTER TABLE pet_actions_partitioned "
+        "RENAME CONSTRAINT pet_actions_pkey TO pet_actions_partitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_pet_actions_pet_id_timestamp_id "
+        "RENAME TO ix_pet_actions_partitioned_pet_id_timestamp_id"
+    )
+    op.execute("ALTER SEQUENCE pet_actions_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE pet_actions (
+            id integer NOT NULL DEFAULT nextval('pet_actions_id_seq'),
+            pet_id integer NOT NULL,
+            action_type actiontype NOT NULL,
+            "timestamp" timestamp with time zone NOT NULL,
+            CONSTRAINT pet_actions_pkey PRIMARY KEY (id),
+            CONSTRAINT pet_actions_pet_id_fkey FOREIGN KEY (pet_id)
+                REFERENCES pets (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE pet_actions_id_seq OWNED BY pet_actions.id")
+
+    op.execute(
+        'INSERT INTO pet_actions (id, pet_id, action_type, "timestamp") '
+        'SELECT id, pet_id, action_type, "timestamp" FROM pet_actions_partitioned'
+    )
+    op.drop_table("pet_actions_partitioned")
+
+    op.create_index(
+        "ix_pet_actions_pet_id_timestamp_id",
+        "pet_actions",
+        ["pet_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+    )
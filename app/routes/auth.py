@@ -1,19 +1,26 @@
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-import bcrypt
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from sqlalchemy import select, text
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from configs.configdb import get_db
-from database.models import User
+from configs.configdb import get_db, get_read_db
+from database.models import Pet, User
+from middleware.pet_decay import decay_row
+from middleware.pet_events import pet_events
+from schemas.pet import PetResponse
 from schemas.user import UserCreate, UserResponse
+from utils.etags import (etag_matches, make_etag, not_modified, pet_etag,
+                         set_etag)
+from utils.password_hasher import HasherSaturated, PasswordHasher
+from utils.ttl_cache import TTLCache
 
 load_dotenv()
 
@@ -27,6 +34,28 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# resolved principals are reused for this long; it also bounds how long a
+# deleted account stays usable on other workers
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
+# bcrypt runs on its own pool; requests beyond workers + queue limit get a 503
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+# accounts that may list pets of every user, e.g. GET /pets/needing_attention
+SUPPORT_USERNAMES = frozenset(
+    name.strip()
+    for name in os.getenv("SUPPORT_USERNAMES", "").split(",")
+    if name.strip()
+)
+
+# pets in /auth/me have the fields the pet endpoints serve, nothing more
+PET_RESPONSE_COLUMNS = tuple(Pet.__table__.c[name] for name in PetResponse.model_fields)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 credentials_exception = HTTPException(
@@ -36,24 +65,47 @@ credentials_exception = HTTPException(
 )
 
 
-def hash_password(password: str) -> str:
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode("utf-8"), salt)
-    return hashed.decode("utf-8")
+password_hasher = PasswordHasher(
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_QUEUE_LIMIT,
+    kind=PASSWORD_HASH_EXECUTOR,
+)
+
+
+async def run_password_hasher(func, *args):
+    try:
+        return await func(*args)
+    except HasherSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ins in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def hash_password(password: str) -> str:
+    return await run_password_hasher(password_hasher.hash, password)
 
 
-def verify_password(password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+async def verify_password(password: str, hashed_password: str) -> bool:
+    return await run_password_hasher(password_hasher.verify, password, hashed_password)
 
 
 async def authenticate_user_db(username: str, password: str, db: AsyncSession):
-    get_user = await db.execute(select(User).where(User.username == username))
-    user = get_user.scalar_one_or_none()
+    get_user = await db.execute(
+        select(User.id, User.username, User.password_hash).where(
+            User.username == username
+        )
+    )
+    user = get_user.one_or_none()
+
+    # hand the connection back to the pool while bcrypt runs
+    await db.rollback()
 
     if not user:
         return None
 
-    if not verify_password(password, user.password_hash):
+    if not await verify_password(password, user.password_hash):
         return None
 
     return user
@@ -66,9 +118,22 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+
+
+principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+
+async def get_current_principal(
     token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-):
+) -> Principal:
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("username")
@@ -78,46 +143,61 @@ async def get_current_user(
         raise credentials_exception
 
     get_user = await db.execute(
-        select(User).options(selectinload(User.pets)).where(User.username == username)
+        select(User.id, User.username).where(User.username == username)
     )
 
-    user = get_user.scalar_one_or_none()
-    if user is None:
+    row = get_user.one_or_none()
+    # hand the connection back to the pool, read endpoints go on with get_read_db
+    await db.rollback()
+    if row is None:
         raise credentials_exception
 
-    return user
+    principal = Principal(id=row.id, username=row.username)
+    principal_cache.set(token, principal, expires_at=payload.get("exp"))
+
+    return principal
+
+
+async def get_support_principal(
+    principal: Principal = Depends(get_current_principal),
+) -> Principal:
+    if principal.username not in SUPPORT_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Support access required"
+        )
+
+    return principal
 
 
 @router.post(
     "/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
 async def register_user(user_create: UserCreate, db: AsyncSession = Depends(get_db)):
-    get_user = await db.execute(
-        select(User).where(User.username == user_create.username)
-    )
+    hashed_pw = await hash_password(user_create.password)
 
-    existing_user = get_user.scalar_one_or_none()
-    if existing_user:
+    new_user = User(username=user_create.username, password_hash=hashed_pw)
+
+    db.add(new_user)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered",
         )
 
-    hashed_pw = hash_password(user_create.password)
-
-    new_user = User(username=user_create.username, password_hash=hashed_pw)
-
-    db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
-
-    result = await db.execute(
-        select(User).where(User.id == new_user.id).options(selectinload(User.pets))
+    # id and created_at are known after the INSERT and a new account has no
+    # pets, so nothing needs to be read back
+    response = UserResponse(
+        id=new_user.id,
+        username=new_user.username,
+        created_at=new_user.created_at,
+        pets=[],
     )
+    await db.commit()
 
-    user_with_pets = result.scalar_one()
-
-    return user_with_pets
+    return response
 
 
 @router.post("/login")
@@ -141,25 +221,50 @@ async def login(
 
 
 @router.get("/me")
-async def get_my_account(current_user: User = Depends(get_current_user)):
+async def get_my_account(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_read_db),
+):
+    created_at = await db.scalar(select(User.created_at).where(User.id == principal.id))
+    if created_at is None:
+        raise credentials_exception
+
+    get_pets = await db.execute(
+        select(*PET_RESPONSE_COLUMNS)
+        .where(Pet.owner_id == principal.id)
+        .order_by(Pet.id)
+    )
+    now = datetime.now(timezone.utc)
+    pets = [decay_row(row, now) for row in get_pets.mappings()]
+
+    etag = make_etag(principal.id, principal.username, created_at, *map(pet_etag, pets))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    set_etag(response, etag)
     return {
-        "id": current_user.id,
-        "username": current_user.username,
-        "created_at": current_user.created_at,
-        "pets": current_user.pets,
+        "id": principal.id,
+        "username": principal.username,
+        "created_at": created_at,
+        "pets": pets,
     }
 
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_my_account(
-    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    await db.delete(current_user)
-    await db.commit()
+    pet_ids = await db.scalars(select(Pet.id).where(Pet.owner_id == current_user.id))
 
-    await db.execute(text("ALTER SEQUENCE users_id_seq RESTART WITH 1"))
-    await db.execute(text("ALTER SEQUENCE pets_id_seq RESTART WITH 1"))
-    await db.execute(text("ALTER SEQUENCE pet_actions_id_seq RESTART WITH 1"))
+    # pets and their actions go with it through ON DELETE CASCADE
+    await db.execute(delete(User).where(User.id == current_user.id))
     await db.commit()
 
+    principal_cache.discard_if(lambda principal: principal.id == current_user.id)
+    for pet_id in pet_ids:
+        pet_events.publish_deleted(pet_id)
+
     return None
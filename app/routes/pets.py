@@ -1,17 +1,37 @@
-from datetime import datetime, timezone
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, text
+import asyncio
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query,
+                     Response, status)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import (bindparam, delete, insert, literal, select, tuple_,
+                        update)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from configs.configdb import get_db
-from database.models import ActionType, Pet, PetActions, User
-from routes.auth import get_current_user
-from schemas.pet import (PetActionCreate, PetActionResponse, PetCreate,
-                         PetResponse, PetUpdate)
+from configs.configdb import get_db, get_read_db
+from configs.configevents import pet_events_config
+from configs.configretention import retention_config
+from database.action_stats import increment_action_stats, upsert_action_stats
+from database.functions import least
+from database.models import ActionType, Pet, PetActionDaily, PetActions
+from middleware.action_buffer import action_buffer
+from middleware.action_retention import action_archive
+from middleware.pet_decay import (apply_decay, as_utc, critical_at_value,
+                                  decay_row, decay_values)
+from middleware.pet_events import pet_events
+from routes.auth import Principal, get_current_principal, get_support_principal
+from schemas.pet import (PetActionCreate, PetActionResponse,
+                         PetBatchActionCreate, PetBatchActionResult, PetCreate,
+                         PetDailyStatsResponse, PetResponse, PetUpdate,
+                         PetUrgencyResponse)
+from utils.etags import etag_matches, not_modified, pet_etag, set_etag
 
 router = APIRouter(prefix="/pets", tags=["Pets & Actions"])
 
+STREAM_BATCH_SIZE = 1000
+
 
 def check_not_pet(pet):
     if not pet:
@@ -28,44 +48,183 @@ async def get_pet_from_db(db, pet_id: int, user_id: int):
 
     data = get_pet.scalar_one_or_none()
 
+    if data is not None:
+        apply_decay(data)
+
     return data
 
 
-async def changing_pet_stats(pet, db, type_stats: str):
-    check_not_pet(pet)
+STAT_ACTIONS = {
+    "hunger": ActionType.FEED,
+    "energy": ActionType.PLAY,
+    "happiness": ActionType.SLEEP,
+}
 
-    if type_stats not in ["hunger", "energy", "happiness"]:
+PET_COLUMNS = (
+    Pet.id,
+    Pet.name,
+    Pet.owner_id,
+    Pet.hunger,
+    Pet.energy,
+    Pet.happiness,
+    Pet.last_updated,
+)
+
+
+async def changing_pet_stats(db, pet_id: int, owner_id: int, type_stats: str):
+    """Decay, bump one stat and log the action atomically; returns the new pet row."""
+    if type_stats not in STAT_ACTIONS:
         raise ValueError("Invalid stat type")
 
-    current_value = getattr(pet, type_stats)
-    setattr(pet, type_stats, min(current_value + 30, 100))
+    now = datetime.now(timezone.utc)
 
-    pet.last_updated = datetime.now(timezone.utc)
+    values = decay_values(now)
+    values[type_stats] = least(values[type_stats] + 30, 100)
+    values["critical_at"] = critical_at_value(values)
 
-    mapping = {
-        "hunger": ActionType.FEED,
-        "energy": ActionType.PLAY,
-        "happiness": ActionType.SLEEP,
+    update_pet = (
+        update(Pet)
+        .where(Pet.id == pet_id, Pet.owner_id == owner_id)
+        .values(**values)
+        .returning(*PET_COLUMNS)
+    )
+    record = {
+        "pet_id": pet_id,
+        "action_type": STAT_ACTIONS[type_stats],
+        "timestamp": now,
     }
 
-    new_action = PetActions(
-        pet_id=pet.id,
-        action_type=mapping[type_stats],
-    )
+    if db.bind.dialect.name == "postgresql" and not action_buffer.enabled:
+        updated = update_pet.cte("updated_pet")
+        log_action = (
+            insert(PetActions)
+            .from_select(
+                ["pet_id", "action_type", "timestamp"],
+                select(
+                    updated.c.id,
+                    literal(record["action_type"], PetActions.action_type.type),
+                    literal(now, PetActions.timestamp.type),
+                ),
+            )
+            .cte("logged_action")
+        )
+        _, upsert = upsert_action_stats("postgresql")
+        count_action = upsert.from_select(
+            ["pet_id", "day", "action_type", "count"],
+            select(
+                updated.c.id,
+                literal(now.date(), PetActionDaily.day.type),
+                literal(record["action_type"], PetActionDaily.action_type.type),
+                literal(1),
+            ),
+        ).cte("counted_action")
+        result = await db.execute(
+            select(updated).add_cte(log_action).add_cte(count_action)
+        )
+        pet = result.one_or_none()
+    else:
+        result = await db.execute(update_pet)
+        pet = result.one_or_none()
+        if pet is not None and not action_buffer.enabled:
+            await db.execute(insert(PetActions).values(**record))
+            await increment_action_stats(db, [record])
 
-    db.add(new_action)
     await db.commit()
-    await db.refresh(pet)
-    await db.refresh(new_action)
+
+    check_not_pet(pet)
+
+    if action_buffer.enabled:
+        await action_buffer.submit([record])
+
+    pet_events.publish(pet._mapping)
 
     return pet
 
 
+async def changing_many_pets_stats(db, owner_id: int, items) -> list[dict]:
+    """Apply a batch of actions with a fixed number of statements, whatever its size."""
+    now = datetime.now(timezone.utc)
+
+    requested_ids = {item.pet_id for item in items if item.type_stats in STAT_ACTIONS}
+    owned = await db.execute(
+        select(Pet.id).where(Pet.id.in_(requested_ids), Pet.owner_id == owner_id)
+    )
+    owned_ids = set(owned.scalars().all())
+
+    applied = [
+        item
+        for item in items
+        if item.type_stats in STAT_ACTIONS and item.pet_id in owned_ids
+    ]
+
+    pets = {}
+    if applied:
+        counts = {
+            pet_id: {f"b_{name}": 0 for name in STAT_ACTIONS} for pet_id in owned_ids
+        }
+        for item in applied:
+            counts[item.pet_id][f"b_{item.type_stats}"] += 1
+
+        values = decay_values(now)
+        for name in STAT_ACTIONS:
+            values[name] = least(values[name] + 30 * bindparam(f"b_{name}"), 100)
+        values["critical_at"] = critical_at_value(values)
+
+        await db.execute(
+            update(Pet.__table__)
+            .where(Pet.id == bindparam("b_id"), Pet.owner_id == owner_id)
+            .values(**values),
+            [{"b_id": pet_id, **stats} for pet_id, stats in counts.items()],
+        )
+        records = [
+            {
+                "pet_id": item.pet_id,
+                "action_type": STAT_ACTIONS[item.type_stats],
+                "timestamp": now,
+            }
+            for item in applied
+        ]
+        if not action_buffer.enabled:
+            await db.execute(insert(PetActions), records)
+            await increment_action_stats(db, records)
+
+        result = await db.execute(select(*PET_COLUMNS).where(Pet.id.in_(owned_ids)))
+        pets = {pet.id: pet for pet in result.all()}
+
+        await db.commit()
+
+        if action_buffer.enabled:
+            await action_buffer.submit(records)
+
+        for pet in pets.values():
+            pet_events.publish(pet._mapping)
+
+    results = []
+    for item in items:
+        if item.type_stats not in STAT_ACTIONS:
+            outcome = "invalid_stat"
+        elif item.pet_id not in pets:
+            outcome = "not_found"
+        else:
+            outcome = "ok"
+
+        results.append(
+            {
+                "pet_id": item.pet_id,
+                "type_stats": item.type_stats,
+                "status": outcome,
+                "pet": pets.get(item.pet_id) if outcome == "ok" else None,
+            }
+        )
+
+    return results
+
+
 @router.post("/create", response_model=PetResponse, status_code=status.HTTP_201_CREATED)
 async def create_pet(
     pet_create: PetCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     get_pet = await db.execute(
         select(Pet).where(Pet.name == pet_create.name, Pet.owner_id == current_user.id)
@@ -84,28 +243,149 @@ async def create_pet(
     await db.commit()
     await db.refresh(new_pet)
 
+    pet_events.publish(
+        {column.key: getattr(new_pet, column.key) for column in PET_COLUMNS}
+    )
+
     return new_pet
 
 
+URGENCY_COLUMNS = (*PET_COLUMNS, Pet.critical_at)
+
+
+async def read_urgency_page(
+    db: AsyncSession, query, response: Response, limit: int, cursor, within_minutes
+) -> list[dict]:
+    """Page of pets in ``critical_at`` order, read as a range of its index."""
+    now = datetime.now(timezone.utc)
+
+    if within_minutes is not None:
+        query = query.where(Pet.critical_at <= now + timedelta(minutes=within_minutes))
+    if cursor is not None:
+        query = query.where(
+            tuple_(Pet.critical_at, Pet.id) > tuple_(*decode_cursor(cursor))
+        )
+
+    result = await db.execute(query.order_by(Pet.critical_at, Pet.id).limit(limit + 1))
+    pets = result.mappings().all()
+
+    if len(pets) > limit:
+        pets = pets[:limit]
+        last = pets[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            last["critical_at"], last["id"]
+        )
+
+    return [decay_row(pet, now) for pet in pets]
+
+
+@router.get("/urgent", response_model=list[PetUrgencyResponse])
+async def get_urgent_pets(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(
+        None, description="Value of the X-Next-Cursor header of the previous page"
+    ),
+    within_minutes: Optional[int] = Query(
+        None, ge=0, description="Only pets whose lowest stat reaches 20 this soon"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    query = select(*URGENCY_COLUMNS).where(Pet.owner_id == current_user.id)
+    return await read_urgency_page(db, query, response, limit, cursor, within_minutes)
+
+
+@router.get("/needing_attention", response_model=list[PetUrgencyResponse])
+async def get_pets_needing_attention(
+    response: Response,
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(
+        None, description="Value of the X-Next-Cursor header of the previous page"
+    ),
+    within_minutes: int = Query(
+        60, ge=0, description="Only pets whose lowest stat reaches 20 this soon"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_support_principal),
+):
+    query = select(*URGENCY_COLUMNS)
+    return await read_urgency_page(db, query, response, limit, cursor, within_minutes)
+
+
 @router.get("/{pet_id}", response_model=PetResponse)
 async def get_pet(
     pet_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    pet = await get_pet_from_db(db, pet_id, current_user.id)
+    result = await db.execute(
+        select(*PET_COLUMNS).where(Pet.id == pet_id, Pet.owner_id == current_user.id)
+    )
+    row = result.one_or_none()
 
-    check_not_pet(pet)
+    check_not_pet(row)
+
+    pet = decay_row(row._mapping)
+    etag = pet_etag(pet)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
+    set_etag(response, etag)
     return pet
 
 
+@router.get("/{pet_id}/events")
+async def get_pet_events(
+    pet_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """Server-sent events with the pet's state, after every change and at stat thresholds."""
+    result = await db.execute(
+        select(*PET_COLUMNS).where(Pet.id == pet_id, Pet.owner_id == current_user.id)
+    )
+    row = result.one_or_none()
+
+    check_not_pet(row)
+
+    # the stream can stay open for hours, it must not keep a pooled connection
+    await db.close()
+
+    return StreamingResponse(
+        stream_pet_events(row._mapping),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def stream_pet_events(state):
+    async with pet_events.subscribe(state) as queue:
+        while True:
+            try:
+                pet = await asyncio.wait_for(
+                    queue.get(), timeout=pet_events_config.HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            if pet.get("deleted"):
+                yield f'event: deleted\ndata: {{"id":{pet["id"]}}}\n\n'
+                return
+
+            data = PetResponse.model_validate(pet).model_dump_json()
+            yield f"event: pet\ndata: {data}\n\n"
+
+
 @router.patch("/{pet_id}", response_model=PetResponse)
 async def update_pet(
     pet_id: int,
     pet_update: PetUpdate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     pet = await get_pet_from_db(db, pet_id, current_user.id)
 
@@ -117,6 +397,8 @@ async def update_pet(
     await db.commit()
     await db.refresh(pet)
 
+    pet_events.publish({column.key: getattr(pet, column.key) for column in PET_COLUMNS})
+
     return pet
 
 
@@ -124,18 +406,17 @@ async def update_pet(
 async def delete_pet(
     pet_id: int,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    pet = await get_pet_from_db(db, pet_id, current_user.id)
-
-    check_not_pet(pet)
-
-    await db.delete(pet)
+    result = await db.execute(
+        delete(Pet).where(Pet.id == pet_id, Pet.owner_id == current_user.id)
+    )
     await db.commit()
 
-    await db.execute(text("ALTER SEQUENCE pets_id_seq RESTART WITH 1"))
-    await db.execute(text("ALTER SEQUENCE pet_actions_id_seq RESTART WITH 1"))
-    await db.commit()
+    if result.rowcount == 0:
+        check_not_pet(None)
+
+    pet_events.publish_deleted(pet_id)
 
     return None
 
@@ -145,27 +426,218 @@ async def action_pet(
     pet_id: int,
     action: PetActionCreate,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
-    pet = await get_pet_from_db(db, pet_id, current_user.id)
-    check_not_pet(pet)
-    return await changing_pet_stats(pet, db, action.type_stats)
+    return await changing_pet_stats(db, pet_id, current_user.id, action.type_stats)
+
+
+@router.post("/actions", response_model=list[PetBatchActionResult])
+async def batch_action_pets(
+    batch: PetBatchActionCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    return await changing_many_pets_stats(db, current_user.id, batch.actions)
+
+
+@router.get("/{pet_id}/stats", response_model=list[PetDailyStatsResponse])
+async def get_pet_stats(
+    pet_id: int,
+    days: int = Query(30, ge=1, le=366, description="Number of days up to today"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    # only ownership matters here, the pet itself is not needed
+    owned = await db.scalar(
+        select(Pet.id).where(Pet.id == pet_id, Pet.owner_id == current_user.id)
+    )
+    check_not_pet(owned)
+
+    today = datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=days - 1)
+
+    result = await db.execute(
+        select(
+            PetActionDaily.day, PetActionDaily.action_type, PetActionDaily.count
+        ).where(PetActionDaily.pet_id == pet_id, PetActionDaily.day >= first_day)
+    )
+
+    per_day = {
+        first_day + timedelta(days=offset): {"day": first_day + timedelta(days=offset)}
+        for offset in range(days)
+    }
+    for row in result.all():
+        if row.day in per_day:
+            per_day[row.day][row.action_type.value] = row.count
+
+    return list(per_day.values())
+
+
+def to_utc(moment: datetime) -> datetime:
+    return as_utc(moment).astimezone(timezone.utc)
+
+
+def encode_cursor(timestamp: datetime, action_id: int) -> str:
+    raw = f"{as_utc(timestamp).isoformat()}|{action_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, action_id = raw.split("|")
+        return to_utc(datetime.fromisoformat(timestamp)), int(action_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
 
 
 @router.get("/{pet_id}/actions_history", response_model=list[PetActionResponse])
 async def get_actions_history(
     pet_id: int,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(
+        None, description="Value of the X-Next-Cursor header of the previous page"
+    ),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    action_type: Optional[ActionType] = None,
+    stream: bool = Query(
+        False, description="Stream every matching action as NDJSON instead of a page"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     pet = await get_pet_from_db(db, pet_id, current_user.id)
     check_not_pet(pet)
 
-    result = await db.execute(
-        select(PetActions)
+    query = (
+        select(PetActions.id, PetActions.action_type, PetActions.timestamp)
         .where(PetActions.pet_id == pet_id)
-        .order_by(PetActions.timestamp.desc())
+        .order_by(PetActions.timestamp.desc(), PetActions.id.desc())
     )
 
-    actions = result.scalars().all()
+    if since is not None:
+        query = query.where(PetActions.timestamp >= to_utc(since))
+    if until is not None:
+        query = query.where(PetActions.timestamp < to_utc(until))
+    if action_type is not None:
+        query = query.where(PetActions.action_type == action_type)
+    before = None
+    if cursor is not None:
+        before = decode_cursor(cursor)
+        query = query.where(
+            tuple_(PetActions.timestamp, PetActions.id) < tuple_(*before),
+            # row comparisons do not prune partitions, a plain bound does
+            PetActions.timestamp <= before[0],
+        )
+
+    filters = {"since": since, "until": until, "action_type": action_type}
+
+    if stream:
+        return StreamingResponse(
+            stream_actions(db, query, pet_id, before, filters),
+            media_type="application/x-ndjson",
+        )
+
+    result = await db.execute(query.limit(limit + 1))
+    actions = result.all()
+
+    if len(actions) <= limit and action_archive is not None:
+        # the page runs past the actions still in the table
+        archived = await read_archived_actions(
+            db, pet_id, limit + 1, before=before, **filters
+        )
+        actions = merge_actions(actions, archived)[: limit + 1]
+
+    if len(actions) > limit:
+        actions = actions[:limit]
+        last = actions[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.timestamp, last.id)
+
     return actions
+
+
+async def stream_actions(db: AsyncSession, query, pet_id: int, before, filters):
+    result = await db.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+    async for partition in result.partitions():
+        before = (partition[-1].timestamp, partition[-1].id)
+        yield serialize_actions(partition)
+
+    if action_archive is not None:
+        archived = await read_archived_actions(db, pet_id, before=before, **filters)
+        for start in range(0, len(archived), STREAM_BATCH_SIZE):
+            yield serialize_actions(archived[start : start + STREAM_BATCH_SIZE])
+
+
+def serialize_actions(actions) -> str:
+    return "".join(
+        PetActionResponse.model_validate(action, from_attributes=True).model_dump_json()
+        + "\n"
+        for action in actions
+    )
+
+
+def merge_actions(*sources) -> list:
+    """Newest-first union of action lists, dropping ids present in more than one."""
+    merged = {action.id: action for source in sources for action in source}
+    return sorted(
+        merged.values(),
+        key=lambda action: (as_utc(action.timestamp), action.id),
+        reverse=True,
+    )
+
+
+async def read_archived_actions(
+    db: AsyncSession,
+    pet_id: int,
+    limit: Optional[int] = None,
+    before: Optional[tuple[datetime, int]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    action_type: Optional[ActionType] = None,
+) -> list:
+    """Actions moved out of ``pet_actions`` by the retention job, newest first.
+
+    The daily rollup is never archived, so it tells which months of the
+    archive hold anything for this pet.
+    """
+    newest = datetime.now(timezone.utc) - timedelta(
+        days=retention_config.RETENTION_DAYS
+    )
+    if until is not None:
+        newest = min(newest, to_utc(until))
+    if before is not None:
+        newest = min(newest, to_utc(before[0]))
+
+    query = (
+        select(PetActionDaily.day)
+        .distinct()
+        .where(PetActionDaily.pet_id == pet_id, PetActionDaily.day <= newest.date())
+    )
+    if since is not None:
+        query = query.where(PetActionDaily.day >= to_utc(since).date())
+    if action_type is not None:
+        query = query.where(PetActionDaily.action_type == action_type)
+
+    days = (await db.execute(query)).scalars().all()
+    months = sorted({day.strftime("%Y-%m") for day in days})
+    if not months:
+        return []
+
+    return await asyncio.to_thread(
+        lambda: list(
+            action_archive.read_history(
+                pet_id,
+                months,
+                limit,
+                before=before,
+                since=since and to_utc(since),
+                until=until and to_utc(until),
+                action_type=action_type,
+            )
+        )
+    )
@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -51,6 +51,17 @@ class PetResponse(BaseModel):
         orm_mode = True
 
 
+class PetUrgencyResponse(PetResponse):
+    critical_at: datetime = Field(
+        ...,
+        description=(
+            "When the pet's lowest stat reaches 20; in the past once it has, "
+            "9999-12-31 while it is more than 50 points above"
+        ),
+        example="2025-12-13T14:10:00Z",
+    )
+
+
 class PetUpdate(BaseModel):
     name: Optional[str] = Field(
         None, min_length=3, max_length=50, description="Pet name", example="Fluffy"
@@ -66,6 +77,30 @@ class PetActionCreate(BaseModel):
     )
 
 
+class PetBatchActionItem(PetActionCreate):
+    pet_id: int = Field(..., description="ID of the pet to act on", example=1)
+
+
+class PetBatchActionCreate(BaseModel):
+    actions: List[PetBatchActionItem] = Field(
+        ...,
+        min_length=1,
+        max_length=500,
+        description="Actions to apply in one transaction (1–500)",
+    )
+
+
+class PetBatchActionResult(BaseModel):
+    pet_id: int = Field(..., description="ID of the pet from the request", example=1)
+    type_stats: str = Field(..., description="Requested stat", example="hunger")
+    status: Literal["ok", "not_found", "invalid_stat"] = Field(
+        ..., description="Outcome of this action", example="ok"
+    )
+    pet: Optional[PetResponse] = Field(
+        None, description="State of the pet after the whole batch, when applied"
+    )
+
+
 class PetActionResponse(BaseModel):
     id: int = Field(..., example=1, description="Action ID")
 
@@ -83,3 +118,10 @@ class PetActionResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class PetDailyStatsResponse(BaseModel):
+    day: date = Field(..., example="2025-12-14", description="Day (UTC)")
+    feed: int = Field(0, example=3, description="Times the pet was fed that day")
+    play: int = Field(0, example=1, description="Times the pet played that day")
+    sleep: int = Field(0, example=2, description="Times the pet slept that day")
@@ -0,0 +1,47 @@
+"""Rebuild the pet_action_daily rollup from the raw pet_actions table.
+
+    cd app && python -m scripts.backfill_action_stats --batch-size 10000
+
+Pets are processed in id ranges; each range is replaced in its own
+transaction, so the command can be stopped and re-run safely. Actions written
+while a range is being rebuilt may be counted twice or missed, so run it
+before enabling traffic on a new rollup or during a quiet period.
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import func, select
+
+from configs.configdb import async_engine, async_session
+from database.action_stats import rebuild_action_stats
+from database.models import Pet
+
+
+async def main(args):
+    async with async_session() as db:
+        bounds = await db.execute(select(func.min(Pet.id), func.max(Pet.id)))
+        min_id, max_id = bounds.one()
+
+    if max_id is None:
+        print("no pets, nothing to backfill")
+        return
+
+    started = time.perf_counter()
+    rows = 0
+    for first in range(args.start or min_id, max_id + 1, args.batch_size):
+        async with async_session() as db:
+            rows += await rebuild_action_stats(db, first, first + args.batch_size)
+            await db.commit()
+        print(f"pets {first}..{first + args.batch_size - 1}: {rows} rollup rows so far")
+
+    print(f"done: {rows} rollup rows in {time.perf_counter() - started:.1f}s")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--start", type=int, help="resume from this pet id")
+    asyncio.run(main(parser.parse_args()))
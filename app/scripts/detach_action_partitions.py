@@ -0,0 +1,48 @@
+"""Drop whole months of action history from the partitioned pet_actions table.
+
+    cd app && python -m scripts.detach_action_partitions --before 2025-01 [--keep]
+
+Every monthly partition older than --before is detached, which is a catalog
+change instead of a DELETE of its rows, and then dropped unless --keep is
+given (a kept partition becomes a plain table, e.g. for pg_dump). Actions
+removed this way disappear from the history endpoint; to keep them readable
+enable ACTIONS_RETENTION instead, which archives months before detaching them.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from configs.configdb import async_engine, async_session
+from database.action_partitions import (detach_partition, is_partitioned,
+                                        list_partitions, partition_name)
+
+
+async def main(args):
+    before = datetime.strptime(args.before, "%Y-%m").replace(tzinfo=timezone.utc)
+
+    async with async_session() as db:
+        if not await is_partitioned(db):
+            print("pet_actions is not partitioned, nothing to detach")
+            return
+
+        for month in await list_partitions(db):
+            if month >= before:
+                break
+
+            await detach_partition(db, month, drop=not args.keep)
+            await db.commit()
+            print(f"{'detached' if args.keep else 'dropped'} {partition_name(month)}")
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--before", required=True, help="first month to keep, as YYYY-MM"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="keep detached partitions as tables"
+    )
+    asyncio.run(main(parser.parse_args()))
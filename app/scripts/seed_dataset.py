@@ -0,0 +1,335 @@
+"""Bulk-load a synthetic dataset of users, pets and actions.
+
+    cd app && python -m scripts.seed_dataset --users 1000000 --seed 42
+
+--url points it at another database, e.g. sqlite+aiosqlite:///seeded.db; the
+tables must already exist.
+
+Pets per user and actions per pet are skewed like real usage: most users have
+one or two pets and most pets a modest history, while a few have many. Actions
+are more frequent in recent days and in the evening. The same --seed and --now
+always produce the same rows (only the password salt differs). Rows go in
+through COPY on Postgres and executemany INSERTs on SQLite, one transaction per
+chunk of users. New ids continue after the existing rows, so the command can
+add to a database that already has data, unless one of the generated
+usernames (--username-prefix followed by the user id) is already taken. Every
+seeded user can log in with --password.
+"""
+
+import argparse
+import asyncio
+import bisect
+import itertools
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import bcrypt
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    create_async_engine)
+
+from configs.configdb import db_config
+from database.action_partitions import create_partitions, is_partitioned
+from database.models import ActionType, Pet, PetActionDaily, PetActions, User
+from middleware.pet_decay import PET_STATS, as_utc, critical_at
+
+USER_COLUMNS = ("id", "username", "password_hash", "created_at")
+PET_COLUMNS = ("id", "name", "owner_id", *PET_STATS, "last_updated", "critical_at")
+ACTION_COLUMNS = ("pet_id", "action_type", "timestamp")
+DAILY_COLUMNS = ("pet_id", "day", "action_type", "count")
+
+PET_NAMES = ("Mochi", "Pixel", "Biscuit", "Nori", "Tofu", "Pudding", "Kiwi", "Bean")
+# relative action volume per hour of the day (UTC), busiest in the evening
+MORNING_WEIGHTS = (2, 1, 1, 1, 1, 2, 4, 6, 7, 6, 5, 5)
+HOURLY_WEIGHTS = MORNING_WEIGHTS + (6, 5, 5, 6, 7, 8, 10, 11, 10, 8, 5, 3)
+# spread of the log-normal number of actions per pet
+ACTIONS_SIGMA = 1.0
+
+
+@dataclass
+class SeedOptions:
+    users: int
+    pets_per_user: float = 2.0
+    max_pets_per_user: int = 20
+    actions_per_pet: float = 10.0
+    history_days: int = 365
+    seed: int = 42
+    now: Optional[datetime] = None
+    password: str = "password"
+    username_prefix: str = "user"
+    chunk_size: int = 10000
+
+
+@dataclass
+class SeedReport:
+    users: int
+    pets: int
+    actions: int
+    first_user_id: int
+    duration: float
+
+
+def seed_username(options: SeedOptions, user_id: int) -> str:
+    return f"{options.username_prefix}{user_id}"
+
+
+class DatasetGenerator:
+    """Deterministic rows for one chunk of users at a time."""
+
+    def __init__(
+        self, options: SeedOptions, now: datetime, password_hash: str, next_pet_id: int
+    ):
+        self.options = options
+        self.next_pet_id = next_pet_id
+        self.now = now
+        self.password_hash = password_hash
+        self.rng = random.Random(options.seed)
+        self.actions = list(ActionType)
+        self.midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.recent_days = options.history_days / 4
+        self.actions_mu = math.log(options.actions_per_pet) - ACTIONS_SIGMA**2 / 2
+        self.hours = list(itertools.accumulate(HOURLY_WEIGHTS))
+
+    def pet_count(self) -> int:
+        # geometric with the requested mean, at least one pet
+        stop = 1 / self.options.pets_per_user
+        count = 1
+        while count < self.options.max_pets_per_user and self.rng.random() > stop:
+            count += 1
+        return count
+
+    def action_count(self) -> int:
+        return int(self.rng.lognormvariate(self.actions_mu, ACTIONS_SIGMA))
+
+    def action_time(self) -> datetime:
+        days = self.rng.expovariate(1 / self.recent_days)
+        days = min(days, self.options.history_days)
+        hour = bisect.bisect(self.hours, self.rng.random() * self.hours[-1])
+        moment = self.midnight + timedelta(
+            days=-int(days), hours=hour, seconds=int(self.rng.random() * 3600)
+        )
+        return moment if moment <= self.now else moment - timedelta(days=1)
+
+    def chunk(self, first_user_id: int, users: int):
+        user_rows, pet_rows, action_rows = [], [], []
+        pet_id = self.next_pet_id
+
+        for user_id in range(first_user_id, first_user_id + users):
+            joined = self.now - timedelta(
+                days=self.rng.uniform(0, self.options.history_days)
+            )
+            user_rows.append(
+                (
+                    user_id,
+                    seed_username(self.options, user_id),
+                    self.password_hash,
+                    joined,
+                )
+            )
+
+            for index in range(self.pet_count()):
+                times = [self.action_time() for _ in range(self.action_count())]
+                action_rows.extend(
+                    (pet_id, self.actions[int(self.rng.random() * 3)], moment)
+                    for moment in times
+                )
+
+                # stats as they were left by the last action, decayed since
+                last_updated = max(times, default=joined)
+                stats = {name: self.rng.randint(40, 100) for name in PET_STATS}
+                pet_rows.append(
+                    (
+                        pet_id,
+                        f"{self.rng.choice(PET_NAMES)}{index}",
+                        user_id,
+                        *stats.values(),
+                        last_updated,
+                        critical_at(stats, last_updated),
+                    )
+                )
+                pet_id += 1
+
+        self.next_pet_id = pet_id
+        return user_rows, pet_rows, action_rows
+
+
+async def taken_username(db, options: SeedOptions, first_user_id: int):
+    """The first generated username that an existing account already has."""
+    last = first_user_id + options.users
+    for first in range(first_user_id, last, options.chunk_size):
+        names = [
+            seed_username(options, user_id)
+            for user_id in range(first, min(first + options.chunk_size, last))
+        ]
+        taken = await db.scalar(
+            select(User.username).where(User.username.in_(names)).limit(1)
+        )
+        if taken is not None:
+            return taken
+    return None
+
+
+def daily_rows(action_rows) -> list[tuple]:
+    counts = Counter(
+        (pet_id, moment.date(), action_type)
+        for pet_id, action_type, moment in action_rows
+    )
+    return [(*key, count) for key, count in counts.items()]
+
+
+async def write_rows(conn, table, columns, rows):
+    if not rows:
+        return
+
+    dialect = conn.dialect
+    processors = [
+        table.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+        for name in columns
+    ]
+    if any(processors):
+        values = list(zip(*rows))
+        for index, process in enumerate(processors):
+            if process is not None:
+                values[index] = map(process, values[index])
+        rows = list(zip(*values))
+
+    if dialect.name == "postgresql":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            table.name, records=rows, columns=columns
+        )
+        return
+
+    placeholders = ", ".join("?" for _ in columns)
+    await conn.exec_driver_sql(
+        f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows,
+    )
+
+
+async def seed_dataset(
+    engine: AsyncEngine, options: SeedOptions, progress=None
+) -> SeedReport:
+    started = time.perf_counter()
+    now = options.now or datetime.now(timezone.utc)
+    password_hash = bcrypt.hashpw(options.password.encode(), bcrypt.gensalt()).decode()
+
+    async with AsyncSession(engine) as db:
+        last_user_id = (await db.scalar(select(func.max(User.id)))) or 0
+        last_pet_id = (await db.scalar(select(func.max(Pet.id)))) or 0
+        if last_user_id:
+            # the unique username index would abort the load halfway through
+            taken = await taken_username(db, options, last_user_id + 1)
+            if taken is not None:
+                raise ValueError(
+                    f"username {taken} already exists, pick another --username-prefix"
+                )
+        if await is_partitioned(db):
+            oldest = now - timedelta(days=options.history_days + 1)
+            months = (now.year - oldest.year) * 12 + now.month - oldest.month
+            await create_partitions(db, oldest, months)
+            await db.commit()
+
+    generator = DatasetGenerator(options, now, password_hash, last_pet_id + 1)
+    first_user_id = last_user_id + 1
+    pets = actions = 0
+
+    for first in range(0, options.users, options.chunk_size):
+        count = min(options.chunk_size, options.users - first)
+        user_rows, pet_rows, action_rows = generator.chunk(first_user_id + first, count)
+
+        async with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                await conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            await write_rows(conn, User.__table__, USER_COLUMNS, user_rows)
+            await write_rows(conn, Pet.__table__, PET_COLUMNS, pet_rows)
+            await write_rows(conn, PetActions.__table__, ACTION_COLUMNS, action_rows)
+            await write_rows(
+                conn, PetActionDaily.__table__, DAILY_COLUMNS, daily_rows(action_rows)
+            )
+
+        pets += len(pet_rows)
+        actions += len(action_rows)
+        if progress is not None:
+            progress(first + count, pets, actions)
+
+    if engine.dialect.name == "postgresql":
+        async with engine.begin() as conn:
+            for table in ("users", "pets"):
+                await conn.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT max(id) FROM {table}))"
+                    )
+                )
+
+    return SeedReport(
+        users=options.users,
+        pets=pets,
+        actions=actions,
+        first_user_id=first_user_id,
+        duration=time.perf_counter() - started,
+    )
+
+
+async def main(args):
+    options = SeedOptions(
+        users=args.users,
+        pets_per_user=args.pets_per_user,
+        max_pets_per_user=args.max_pets_per_user,
+        actions_per_pet=args.actions_per_pet,
+        history_days=args.history_days,
+        seed=args.seed,
+        now=as_utc(datetime.fromisoformat(args.now)) if args.now else None,
+        password=args.password,
+        username_prefix=args.username_prefix,
+        chunk_size=args.chunk_size,
+    )
+    started = time.perf_counter()
+
+    def progress(users, pets, actions):
+        print(
+            f"{users} users, {pets} pets, {actions} actions "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+    engine = create_async_engine(args.url)
+    try:
+        report = await seed_dataset(engine, options, progress)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    finally:
+        await engine.dispose()
+    print(
+        f"done: {report.users} users from id {report.first_user_id}, "
+        f"{report.pets} pets, {report.actions} actions in {report.duration:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url",
+        default=db_config.uri_postgres(),
+        help="database URL, defaults to the configured Postgres database",
+    )
+    parser.add_argument("--users", type=int, required=True)
+    parser.add_argument("--pets-per-user", type=float, default=2.0, help="mean")
+    parser.add_argument("--max-pets-per-user", type=int, default=20)
+    parser.add_argument("--actions-per-pet", type=float, default=10.0, help="mean")
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--now", help="ISO timestamp the history ends at, for identical reruns"
+    )
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--username-prefix", default="user")
+    parser.add_argument(
+        "--chunk-size", type=int, default=10000, help="users per transaction"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,69 @@
+import time
+from dataclasses import asdict, dataclass
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    timeouts: int = 0
+    # time from asking for a connection until having it, including pre-ping
+    # and opening new connections
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    # time connections spent checked out
+    hold_seconds_total: float = 0.0
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """The default async queue pool, plus checkout wait and hold time statistics."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+
+        checked_out_at = time.perf_counter()
+        waited = checked_out_at - started
+        self.stats.checkouts += 1
+        self.stats.wait_seconds_total += waited
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, waited)
+        connection.info["checked_out_at"] = checked_out_at
+
+        return connection
+
+    def _do_return_conn(self, record):
+        checked_out_at = record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            self.stats.hold_seconds_total += time.perf_counter() - checked_out_at
+
+        super()._do_return_conn(record)
+
+
+def pool_snapshot(engine: AsyncEngine) -> dict:
+    """Current occupancy of the engine's pool and, if instrumented, its statistics."""
+    pool = engine.pool
+    snapshot = {}
+
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        snapshot.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            # negative while fewer than ``size`` connections are open
+            overflow=pool.overflow(),
+        )
+    if isinstance(pool, InstrumentedPool):
+        snapshot.update(asdict(pool.stats))
+
+    return snapshot
@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Mapping, Optional
+
+from fastapi import Response, status
+
+
+def etag_part(part) -> str:
+    if isinstance(part, datetime):
+        if part.tzinfo is None:
+            part = part.replace(tzinfo=timezone.utc)
+        return part.astimezone(timezone.utc).isoformat()
+    return str(part)
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over ``parts``."""
+    raw = "|".join(etag_part(part) for part in parts)
+    return '"%s"' % hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def pet_etag(pet: Mapping) -> str:
+    """ETag of a pet as it is served, i.e. after decay was applied."""
+    return make_etag(
+        pet["id"],
+        pet["name"],
+        pet["owner_id"],
+        pet["last_updated"],
+        pet["hunger"],
+        pet["energy"],
+        pet["happiness"],
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"},
+    )
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # clients may keep the response but have to revalidate it before every use
+    response.headers["Cache-Control"] = "private, no-cache"
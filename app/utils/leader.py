@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def advisory_lock_key(name: str) -> int:
+    digest = hashlib.sha1(name.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class AdvisoryLeaderLock:
+    """Leadership held through a session-level Postgres advisory lock.
+
+    The lock lives as long as the dedicated connection does, so a crashed
+    leader releases it as soon as Postgres notices the connection is gone.
+    """
+
+    def __init__(self, engine: AsyncEngine, name: str):
+        self.engine = engine
+        self.name = name
+        self.key = advisory_lock_key(name)
+        self._conn = None
+
+    async def acquire(self) -> bool:
+        if self._conn is not None:
+            try:
+                await self._conn.execute(text("SELECT 1"))
+                await self._conn.commit()
+                return True
+            except Exception:
+                logger.warning("lost leadership for %s", self.name)
+                await self._conn.invalidate()
+                await self._conn.close()
+                self._conn = None
+
+        conn = await self.engine.connect()
+        try:
+            locked = await conn.scalar(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            )
+            await conn.commit()
+        except Exception:
+            await conn.close()
+            raise
+
+        if not locked:
+            await conn.close()
+            return False
+
+        logger.info("acquired leadership for %s", self.name)
+        self._conn = conn
+        return True
+
+    async def release(self):
+        if self._conn is None:
+            return
+
+        conn, self._conn = self._conn, None
+        try:
+            await conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self.key}
+            )
+            await conn.commit()
+        except Exception:
+            await conn.invalidate()
+        finally:
+            await conn.close()
+
+
+class FileLeaderLock:
+    """Leadership held through an exclusive ``flock`` for single-host deployments."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    async def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+
+        if fcntl is None:
+            return True
+
+        file = open(self.path, "a+")
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+
+        logger.info("acquired leadership through %s", self.path)
+        self._file = file
+        return True
+
+    async def release(self):
+        if self._file is None:
+            return
+
+        file, self._file = self._file, None
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        file.close()
+
+
+def create_leader_lock(engine: AsyncEngine, name: str, lock_dir: str):
+    if engine.dialect.name == "postgresql":
+        return AdvisoryLeaderLock(engine, name)
+    return FileLeaderLock(os.path.join(lock_dir, f"tamagoapi-{name}.lock"))
+
+
+async def run_as_leader(name: str, tick, interval: float, leader=None):
+    """Call ``tick`` every ``interval`` seconds, only while holding ``leader``.
+
+    Followers retry the lock every interval, so one of them takes over as soon
+    as the leader dies and its lock is released.
+    """
+    try:
+        while True:
+            try:
+                if leader is None or await leader.acquire():
+                    await tick()
+            except Exception:
+                logger.exception("%s tick failed", name)
+
+            await asyncio.sleep(interval)
+    finally:
+        if leader is not None:
+            await leader.release()
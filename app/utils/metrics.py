@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from typing import Callable, Union
+
+LabelValues = tuple[str, ...]
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def format_labels(names: tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, labels: LabelValues = ()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, format_labels(self.labels, labels), value
+
+
+class Histogram:
+    """Fixed buckets; observing is a bisect and two additions on a preallocated series."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # per label set: a count per bucket, then +Inf, then the sum
+        self.series: dict[LabelValues, list] = {}
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self):
+        bounds = (*self.buckets, float("inf"))
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    format_labels(
+                        (*self.labels, "le"), (*labels, format_value(bound))
+                    ),
+                    cumulative,
+                )
+            label_text = format_labels(self.labels, labels)
+            yield f"{self.name}_sum", label_text, series[-1]
+            yield f"{self.name}_count", label_text, cumulative
+
+
+class CallbackMetric:
+    """Read at scrape time from state kept elsewhere, e.g. pool occupancy."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        read: Callable[[], Union[float, dict[LabelValues, float]]],
+        labels: tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.read = read
+        self.labels = labels
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            yield self.name, format_labels(self.labels, labels), value
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format.
+
+    Metrics are only touched from the event loop thread, so updates take no lock.
+    """
+
+    def __init__(self):
+        self.metrics: dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+        labels: tuple[str, ...] = (),
+    ) -> Histogram:
+        return self.register(Histogram(name, help, buckets, labels))
+
+    def callback(self, name: str, help: str, kind: str, read, labels=()):
+        return self.register(CallbackMetric(name, help, kind, read, labels))
+
+    def unregister(self, name: str):
+        self.metrics.pop(name, None)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
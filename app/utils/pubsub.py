@@ -0,0 +1,152 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], None]
+
+
+class LocalBroker:
+    """Delivers messages to handlers in this process only."""
+
+    def __init__(self):
+        self.handlers: list[Handler] = []
+
+    async def start(self, handler: Handler):
+        self.handlers.append(handler)
+
+    def publish(self, message: dict):
+        for handler in self.handlers:
+            handler(message)
+
+    async def close(self):
+        self.handlers.clear()
+
+
+class PostgresBroker:
+    """Delivers JSON messages to every worker through Postgres LISTEN/NOTIFY.
+
+    ``publish`` only queues the message; a sender task batches the NOTIFYs on
+    the broker's own connection, so publishers never wait for the database.
+    When that connection drops it is reopened, with exponential backoff, and
+    LISTEN is run again; messages sent by other workers meanwhile are lost.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        channel: str,
+        max_pending: int = 10000,
+        min_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ):
+        self.engine = engine
+        self.channel = channel
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.handler: Optional[Handler] = None
+        self.connection = None
+        self.driver_connection = None
+        self.lost = asyncio.Event()
+        self.sender: Optional[asyncio.Task] = None
+        self.watcher: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.reconnects = 0
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+        await self.connect()
+        self.sender = asyncio.create_task(self.send())
+        self.watcher = asyncio.create_task(self.reconnect())
+
+    def on_notify(self, connection, pid, channel, payload):
+        try:
+            self.handler(json.loads(payload))
+        except Exception:
+            logger.exception("pubsub handler failed")
+
+    def on_terminate(self, connection):
+        if connection is self.driver_connection:
+            self.lost.set()
+
+    async def connect(self):
+        self.lost.clear()
+        self.connection = await self.engine.connect()
+        raw = await self.connection.get_raw_connection()
+        self.driver_connection = raw.driver_connection
+        self.driver_connection.add_termination_listener(self.on_terminate)
+        await self.driver_connection.add_listener(self.channel, self.on_notify)
+
+    async def disconnect(self, invalidate: bool = False):
+        connection = self.connection
+        self.connection = self.driver_connection = None
+        if connection is None:
+            return
+        try:
+            if invalidate:
+                # a dropped connection must not go back to the pool
+                await connection.invalidate()
+            await connection.close()
+        except Exception:
+            logger.warning("could not close the pubsub connection", exc_info=True)
+
+    async def reconnect(self):
+        while True:
+            await self.lost.wait()
+            logger.warning(
+                "pubsub connection lost, listening on %s again", self.channel
+            )
+
+            backoff = self.min_backoff
+            while True:
+                await self.disconnect(invalidate=True)
+                try:
+                    await self.connect()
+                    break
+                except Exception:
+                    logger.warning(
+                        "could not listen on %s, retrying in %.1fs",
+                        self.channel,
+                        backoff,
+                        exc_info=True,
+                    )
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+            self.reconnects += 1
+
+    def publish(self, message: dict):
+        try:
+            self.outbox.put_nowait(json.dumps(message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def send(self):
+        while True:
+            payloads = [await self.outbox.get()]
+            while not self.outbox.empty() and len(payloads) < 500:
+                payloads.append(self.outbox.get_nowait())
+
+            connection = self.driver_connection
+            try:
+                await connection.executemany(
+                    "SELECT pg_notify($1, $2)",
+                    [(self.channel, payload) for payload in payloads],
+                )
+            except Exception:
+                self.dropped += len(payloads)
+                logger.exception("could not publish %d messages", len(payloads))
+                if connection is not None and connection.is_closed():
+                    self.on_terminate(connection)
+
+    async def close(self):
+        tasks = [task for task in (self.watcher, self.sender) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.disconnect()
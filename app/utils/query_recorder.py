@@ -0,0 +1,113 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import cache
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class RecordedQuery:
+    statement: str
+    parameters: object
+    seconds: float
+
+
+class QueryRecorder:
+    """Records the SQL statements executed in the current context.
+
+    Statements run by code awaited inside ``with QueryRecorder() as queries:``,
+    such as a request sent through an in-process client, are recorded, while
+    those of unrelated tasks running at the same time are not. Recorders may
+    be nested; the outer ones see the statements of the inner ones too.
+
+    Statements finishing before the ``record_from`` ``time.perf_counter()``
+    instant are only counted, in ``skipped`` and ``skipped_seconds``.
+    """
+
+    def __init__(self, record_from: float = 0.0):
+        self.queries: list[RecordedQuery] = []
+        self.record_from = record_from
+        self.skipped = 0
+        self.skipped_seconds = 0.0
+        self.parent: Optional[QueryRecorder] = None
+        self._token = None
+
+    def __enter__(self) -> "QueryRecorder":
+        instrument_engines()
+        self.parent = current_recorder.get()
+        self._token = current_recorder.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        current_recorder.reset(self._token)
+        self._token = None
+        self.parent = None
+
+    def __len__(self) -> int:
+        return len(self.queries) + self.skipped
+
+    @property
+    def seconds(self) -> float:
+        return sum(query.seconds for query in self.queries) + self.skipped_seconds
+
+    def repeated(self) -> dict[str, int]:
+        """Statements executed more than once, the usual sign of an N+1 pattern."""
+        counts = Counter(query.statement for query in self.queries)
+        return {statement: count for statement, count in counts.items() if count > 1}
+
+    def report(self) -> str:
+        lines = [f"{len(self)} statements in {self.seconds * 1000:.1f}ms:"]
+        if self.skipped:
+            lines.append(f"  ({self.skipped} statements before recording began)")
+        for index, query in enumerate(self.queries, 1):
+            statement = " ".join(query.statement.split())
+            lines.append(f"{index:3}. ({query.seconds * 1000:.2f}ms) {statement}")
+        return "\n".join(lines)
+
+
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar(
+    "current_recorder", default=None
+)
+
+
+# called with the statement and its duration after every statement of every
+# engine once instrumented, e.g. to keep metrics
+statement_listeners: list[Callable[[str, float], None]] = []
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "query_started", None)
+    if started is None:
+        return
+    finished = time.perf_counter()
+    seconds = finished - started
+
+    for listener in statement_listeners:
+        listener(statement, seconds)
+
+    recorder = current_recorder.get()
+    query = None
+    while recorder is not None:
+        if finished < recorder.record_from:
+            recorder.skipped += 1
+            recorder.skipped_seconds += seconds
+        else:
+            if query is None:
+                query = RecordedQuery(statement, parameters, seconds)
+            recorder.queries.append(query)
+        recorder = recorder.parent
+
+
+@cache
+def instrument_engines():
+    """Time every statement of every engine, async ones included; idempotent."""
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
@@ -0,0 +1,41 @@
+import itertools
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaRouter:
+    """Round-robin over read replicas, skipping the ones that recently failed.
+
+    An ejected replica is left alone for ``eject_seconds`` and then tried again.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], eject_seconds: float):
+        self.engines = list(engines)
+        self.eject_seconds = eject_seconds
+        self.ejected_until: dict[AsyncEngine, float] = {}
+        self._turns = itertools.count()
+
+    def candidates(self) -> list[AsyncEngine]:
+        """Healthy replicas, starting with the one whose turn it is."""
+        if not self.engines:
+            return []
+
+        start = next(self._turns) % len(self.engines)
+        ordered = self.engines[start:] + self.engines[:start]
+
+        now = time.monotonic()
+        return [
+            engine for engine in ordered if self.ejected_until.get(engine, 0) <= now
+        ]
+
+    def eject(self, engine: AsyncEngine):
+        self.ejected_until[engine] = time.monotonic() + self.eject_seconds
+        logger.warning(
+            "read replica %s ejected for %.0fs",
+            engine.url.render_as_string(hide_password=True),
+            self.eject_seconds,
+        )
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# leaf frame of the samples taken while the profiled task was suspended
+WAITING = "(waiting)"
+
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    file = os.path.basename(code.co_filename)
+    return f"{code.co_qualname} ({file}:{code.co_firstlineno})"
+
+
+def awaited_frames(coro) -> list:
+    """Frames of a suspended coroutine and of everything it is awaiting."""
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            frame = getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = (
+            getattr(coro, "cr_await", None)
+            or getattr(coro, "ag_await", None)
+            or getattr(coro, "gi_yieldfrom", None)
+        )
+    return frames
+
+
+class TaskProfile:
+    """Wall-clock stack samples of one asyncio task.
+
+    A sample taken while the task runs holds the thread's stack from the
+    task's coroutine down; one taken while it is suspended holds the chain of
+    awaits it is stuck in, ending in ``(waiting)``.
+    """
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.root = task.get_coro().cr_frame
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def sample(self, frame, current: Optional[asyncio.Task]):
+        if current is self.task and frame is not None:
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                if frame is self.root:
+                    break
+                frame = frame.f_back
+            names = [frame_name(frame) for frame in reversed(frames)]
+        else:
+            names = [
+                frame_name(frame) for frame in awaited_frames(self.task.get_coro())
+            ]
+            names.append(WAITING)
+
+        self.stacks[";".join(name.replace(";", ",") for name in names)] += 1
+        self.samples += 1
+
+    def folded(self) -> str:
+        """Samples in the folded format of flamegraph.pl, speedscope and inferno."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class StackSampler:
+    """Samples the stacks of the watched tasks that ran past their deadline.
+
+    A daemon thread checks the deadlines every ``poll`` seconds and samples
+    the event loop thread every ``interval`` seconds while a profile is open,
+    so watching a task that finishes in time costs a dictionary insert and
+    delete.
+    """
+
+    def __init__(self, interval: float, poll: float):
+        self.interval = interval
+        self.poll = poll
+        self.deadlines: dict[asyncio.Task, float] = {}
+        self.profiles: dict[asyncio.Task, TaskProfile] = {}
+        self.target: Optional[tuple[asyncio.AbstractEventLoop, int]] = None
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def watch(self, task: asyncio.Task, delay: float):
+        """Sample ``task`` from ``delay`` seconds on; call it on the loop thread."""
+        self.target = (asyncio.get_running_loop(), threading.get_ident())
+        with self.lock:
+            self.deadlines[task] = time.perf_counter() + delay
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run, name="stack-sampler", daemon=True
+            )
+            self.thread.start()
+        if delay <= 0:
+            self.wakeup.set()
+
+    def unwatch(self, task: asyncio.Task) -> Optional[TaskProfile]:
+        """Stop watching ``task`` and return its profile, if sampling started."""
+        with self.lock:
+            del self.deadlines[task]
+            return self.profiles.pop(task, None)
+
+    def run(self):
+        while True:
+            with self.lock:
+                now = time.perf_counter()
+                for task, deadline in self.deadlines.items():
+                    if deadline <= now and task not in self.profiles:
+                        self.profiles[task] = TaskProfile(task)
+
+                if self.profiles:
+                    loop, thread_id = self.target
+                    frame = sys._current_frames().get(thread_id)
+                    current = asyncio.current_task(loop)
+                    for profile in self.profiles.values():
+                        profile.sample(frame, current)
+                    del frame
+                    timeout = self.interval
+                else:
+                    timeout = self.poll
+                self.wakeup.clear()
+
+            self.wakeup.wait(timeout)
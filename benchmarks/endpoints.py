@@ -0,0 +1,297 @@
+"""Measure throughput and latency percentiles of the main API endpoints.
+
+    python benchmarks/endpoints.py --users 2000 --concurrency 16 --requests 2000
+    python benchmarks/endpoints.py --scenarios get_pet,history --output after.json
+    python benchmarks/endpoints.py --baseline before.json   # compare with an earlier run
+    python benchmarks/endpoints.py --server                  # through a local uvicorn
+
+Drives the real app in-process through httpx.ASGITransport (or over TCP to a
+uvicorn server started in the same process) against a throwaway SQLite
+database, or ``--url``, which must be empty. Prints a JSON report with
+throughput and p50/p95/p99 per endpoint for every scenario.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import uvicorn  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import (async_sessionmaker,  # noqa: E402
+                                    create_async_engine)
+
+import routes.auth  # noqa: E402
+from configs.configdb import Base, get_db, get_read_db  # noqa: E402
+from database.models import Pet  # noqa: E402
+from main import app  # noqa: E402
+from scripts.seed_dataset import SeedOptions, seed_dataset  # noqa: E402
+
+PASSWORD = "bench-password"
+STATS = ("hunger", "energy", "happiness")
+
+
+class Dataset:
+    def __init__(self, pets: dict[int, list[int]], seed: int):
+        self.pets = pets
+        self.owners = list(pets)
+        self.rng = random.Random(seed)
+        self.tokens: dict[int, str] = {}
+        self.registered = itertools.count()
+
+    def headers(self, user_id: int) -> dict:
+        token = self.tokens.get(user_id)
+        if token is None:
+            token = self.tokens[user_id] = routes.auth.create_access_token(
+                {"username": f"user{user_id}"}, timedelta(hours=1)
+            )
+        return {"Authorization": f"Bearer {token}"}
+
+    def pick(self) -> tuple[dict, int]:
+        """Headers of a random user and the id of one of their pets."""
+        user_id = self.rng.choice(self.owners)
+        return self.headers(user_id), self.rng.choice(self.pets[user_id])
+
+
+async def load_dataset(engine, args) -> Dataset:
+    await seed_dataset(
+        engine,
+        SeedOptions(
+            users=args.users,
+            pets_per_user=args.pets_per_user,
+            actions_per_pet=args.actions_per_pet,
+            history_days=30,
+            seed=args.seed,
+            password=PASSWORD,
+        ),
+    )
+
+    pets: dict[int, list[int]] = {}
+    async with engine.connect() as conn:
+        for pet_id, owner_id in await conn.execute(select(Pet.id, Pet.owner_id)):
+            pets.setdefault(owner_id, []).append(pet_id)
+
+    return Dataset(pets, args.seed)
+
+
+async def register_login(client, data: Dataset):
+    username = f"bench{next(data.registered)}"
+    credentials = {"username": username, "password": PASSWORD}
+    yield "POST /auth/register", client.post("/auth/register", json=credentials)
+    yield "POST /auth/login", client.post("/auth/login", data=credentials)
+
+
+async def get_pet(client, data: Dataset):
+    headers, pet_id = data.pick()
+    yield "GET /pets/{pet_id}", client.get(f"/pets/{pet_id}", headers=headers)
+
+
+async def action(client, data: Dataset):
+    headers, pet_id = data.pick()
+    yield "PATCH /pets/{pet_id}/action", client.patch(
+        f"/pets/{pet_id}/action",
+        json={"type_stats": data.rng.choice(STATS)},
+        headers=headers,
+    )
+
+
+async def history(client, data: Dataset):
+    headers, pet_id = data.pick()
+    yield "GET /pets/{pet_id}/actions_history", client.get(
+        f"/pets/{pet_id}/actions_history", params={"limit": 100}, headers=headers
+    )
+
+
+async def me(client, data: Dataset):
+    headers, _ = data.pick()
+    yield "GET /auth/me", client.get("/auth/me", headers=headers)
+
+
+SCENARIOS = {
+    "register_login": register_login,
+    "get_pet": get_pet,
+    "action": action,
+    "history": history,
+    "me": me,
+}
+
+
+def summarize(samples: list[float]) -> dict:
+    summary = {"count": len(samples)}
+    if len(samples) < 2:
+        return summary
+
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    summary.update(
+        mean_ms=round(statistics.fmean(samples), 3),
+        p50_ms=round(cuts[49], 3),
+        p95_ms=round(cuts[94], 3),
+        p99_ms=round(cuts[98], 3),
+        max_ms=round(max(samples), 3),
+    )
+    return summary
+
+
+async def run_scenario(
+    client, scenario, data: Dataset, requests: int, concurrency: int
+):
+    samples: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    remaining = itertools.count(requests, -1)
+
+    async def worker():
+        while next(remaining) > 0:
+            async for endpoint, call in scenario(client, data):
+                started = time.perf_counter()
+                response = await call
+                elapsed = (time.perf_counter() - started) * 1000
+
+                if response.status_code >= 400:
+                    errors[endpoint] = errors.get(endpoint, 0) + 1
+                samples.setdefault(endpoint, []).append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    total = sum(len(values) for values in samples.values())
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(total / duration, 1) if duration else None,
+        "endpoints": {
+            endpoint: {**summarize(values), "errors": errors.get(endpoint, 0)}
+            for endpoint, values in samples.items()
+        },
+    }
+
+
+def compare(report: dict, baseline: dict):
+    """Print the p50/p95/p99 change of every endpoint present in both runs."""
+    for name, scenario in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before is None:
+            continue
+        for endpoint, summary in scenario["endpoints"].items():
+            old = before["endpoints"].get(endpoint)
+            if old is None or "p50_ms" not in summary or "p50_ms" not in old:
+                continue
+            changes = " ".join(
+                f"{key[:-3]} {(summary[key] - old[key]) / old[key]:+.0%}"
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+                if old[key]
+            )
+            print(f"{name:15} {endpoint:40} {changes}", file=sys.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main(args):
+    url = args.url
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(), "endpoints.db")
+        url = f"sqlite+aiosqlite:///{path}"
+
+    engine = create_async_engine(url)
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    data = await load_dataset(engine, args)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+
+    server = serving = None
+    if args.server:
+        port = free_port()
+        server = uvicorn.Server(
+            uvicorn.Config(app, port=port, lifespan="off", log_level="warning")
+        )
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        client = AsyncClient(base_url=f"http://127.0.0.1:{port}")
+    else:
+        client = AsyncClient(transport=ASGITransport(app=app), base_url="http://bench")
+
+    report = {
+        "transport": "uvicorn" if args.server else "asgi",
+        "database": engine.dialect.name,
+        "users": args.users,
+        "pets_per_user": args.pets_per_user,
+        "actions_per_pet": args.actions_per_pet,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "scenarios": {},
+    }
+
+    async with client:
+        for name in args.scenarios.split(","):
+            requests = args.requests
+            if name == "register_login":
+                # every iteration hashes and checks a password
+                requests = max(1, requests // 10)
+            report["scenarios"][name] = await run_scenario(
+                client, SCENARIOS[name], data, requests, args.concurrency
+            )
+
+    if server is not None:
+        server.should_exit = True
+        await serving
+
+    routes.auth.password_hasher.shutdown()
+    await engine.dispose()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(report, json.load(file))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database URL, defaults to a temp SQLite file")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--pets-per-user", type=float, default=2.0, help="mean")
+    parser.add_argument("--actions-per-pet", type=float, default=50.0, help="mean")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--requests",
+        type=int,
+        default=2000,
+        help="requests per scenario; register_login runs a tenth of them",
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--server", action="store_true", help="go through uvicorn")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""Measure pet endpoint latency while a storm of logins is hashing passwords.
+
+    python benchmarks/login_storm.py --duration 5 --readers 8 --logins 16
+    python benchmarks/login_storm.py --blocking   # bcrypt on the event loop, as before
+
+Drives the real app in-process through httpx.ASGITransport against a
+throwaway SQLite database and prints GET /pets/{id} latency percentiles
+without and with concurrent logins.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+import bcrypt  # noqa: E402
+from httpx import ASGITransport, AsyncClient  # noqa: E402
+from sqlalchemy.ext.asyncio import (async_sessionmaker,  # noqa: E402
+                                    create_async_engine)
+
+import routes.auth  # noqa: E402
+from configs.configdb import Base, get_db, get_read_db  # noqa: E402
+from main import app  # noqa: E402
+
+CREDENTIALS = {"username": "stormuser", "password": "storm-password"}
+
+
+class BlockingHasher:
+    """The previous behaviour: bcrypt called directly inside the handler."""
+
+    async def hash(self, password):
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+    async def verify(self, password, hashed_password):
+        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+    def shutdown(self):
+        pass
+
+
+def percentiles(samples: list[float]) -> str:
+    if len(samples) < 2:
+        return "not enough samples"
+    cuts = statistics.quantiles(samples, n=100)
+    return (
+        f"n={len(samples)} p50={cuts[49]:.1f}ms "
+        f"p95={cuts[94]:.1f}ms p99={cuts[98]:.1f}ms max={max(samples):.1f}ms"
+    )
+
+
+async def read_loop(client, url, headers, deadline, samples):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        response.raise_for_status()
+        samples.append((time.perf_counter() - started) * 1000)
+
+
+async def login_loop(client, deadline, counts):
+    while time.perf_counter() < deadline:
+        response = await client.post("/auth/login", data=CREDENTIALS)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def phase(client, url, headers, args, logins: int):
+    deadline = time.perf_counter() + args.duration
+    samples, counts = [], {}
+
+    await asyncio.gather(
+        *(
+            read_loop(client, url, headers, deadline, samples)
+            for _ in range(args.readers)
+        ),
+        *(login_loop(client, deadline, counts) for _ in range(logins)),
+    )
+
+    return samples, counts
+
+
+async def main(args):
+    if args.blocking:
+        routes.auth.password_hasher = BlockingHasher()
+
+    path = os.path.join(tempfile.mkdtemp(), "storm.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://bench"
+    ) as client:
+        await client.post("/auth/register", json=CREDENTIALS)
+        login = await client.post("/auth/login", data=CREDENTIALS)
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        pet = await client.post("/pets/create", json={"name": "Storm"}, headers=headers)
+        url = f"/pets/{pet.json()['id']}"
+
+        quiet, _ = await phase(client, url, headers, args, logins=0)
+        stormy, counts = await phase(client, url, headers, args, logins=args.logins)
+
+    mode = "blocking" if args.blocking else "pooled"
+    print(f"bcrypt mode: {mode}")
+    print(f"GET {url} alone:        {percentiles(quiet)}")
+    print(f"GET {url} during storm: {percentiles(stormy)}")
+    print(f"login responses: {counts}")
+
+    routes.auth.password_hasher.shutdown()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--blocking", action="store_true")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,156 @@
+"""Show query plans of the hot lookup paths before and after their indexes.
+
+    python benchmarks/query_plans.py --users 20000 --pets-per-user 3 --actions-per-pet 20
+
+Seeds a throwaway SQLite database (or ``--url`` for Postgres, which must be
+empty) and prints ``EXPLAIN`` output without and with the model indexes.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "app"))
+
+from sqlalchemy import insert, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.schema import CreateIndex, DropIndex  # noqa: E402
+
+from configs.configdb import Base  # noqa: E402
+from database.models import ActionType, Pet, PetActions, User  # noqa: E402
+
+INDEXES = [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+def hot_queries(user_count: int, pet_count: int):
+    username = f"user{user_count // 2}"
+    owner_id = user_count // 2
+    pet_id = pet_count // 2
+
+    return {
+        "login / get_current_user": select(User).where(User.username == username),
+        "get_pet_from_db": select(Pet).where(
+            Pet.id == pet_id, Pet.owner_id == owner_id
+        ),
+        "selectinload(User.pets)": select(Pet).where(Pet.owner_id.in_([owner_id])),
+        "create_pet name check": select(Pet).where(
+            Pet.name == "pet0", Pet.owner_id == owner_id
+        ),
+        "get_actions_history": select(PetActions)
+        .where(PetActions.pet_id == pet_id)
+        .order_by(PetActions.timestamp.desc(), PetActions.id.desc())
+        .limit(101),
+    }
+
+
+async def seed(conn, users: int, pets_per_user: int, actions_per_pet: int):
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc)
+
+    await conn.execute(
+        insert(User),
+        [
+            {"id": i, "username": f"user{i}", "password_hash": "x", "created_at": now}
+            for i in range(1, users + 1)
+        ],
+    )
+
+    pets = [
+        {"owner_id": owner, "name": f"pet{n}", "last_updated": now}
+        for owner in range(1, users + 1)
+        for n in range(pets_per_user)
+    ]
+    await conn.execute(insert(Pet), pets)
+
+    actions = list(ActionType)
+    batch = []
+    for pet_id in range(1, len(pets) + 1):
+        for _ in range(actions_per_pet):
+            batch.append(
+                {
+                    "pet_id": pet_id,
+                    "action_type": rng.choice(actions),
+                    "timestamp": now - timedelta(minutes=rng.randrange(525600)),
+                }
+            )
+        if len(batch) >= 50000:
+            await conn.execute(insert(PetActions), batch)
+            batch = []
+    if batch:
+        await conn.execute(insert(PetActions), batch)
+
+    return users, len(pets)
+
+
+async def explain(conn, statement) -> str:
+    compiled = statement.compile(
+        dialect=conn.dialect, compile_kwargs={"literal_binds": True}
+    )
+    if conn.dialect.name == "sqlite":
+        rows = await conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))
+        return "\n".join(row[-1] for row in rows)
+
+    rows = await conn.execute(text(f"EXPLAIN ANALYZE {compiled}"))
+    return "\n".join(row[0] for row in rows)
+
+
+async def print_plans(conn, queries, title: str):
+    print(f"\n===== {title} =====")
+    for name, statement in queries.items():
+        started = time.perf_counter()
+        await conn.execute(statement)
+        elapsed = (time.perf_counter() - started) * 1000
+
+        print(f"\n-- {name} ({elapsed:.2f} ms)")
+        print(await explain(conn, statement))
+
+
+async def main(args):
+    url = args.url
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(), "plans.db")
+        url = f"sqlite+aiosqlite:///{path}"
+
+    engine = create_async_engine(url)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for index in INDEXES:
+            await conn.execute(DropIndex(index))
+
+        started = time.perf_counter()
+        users, pets = await seed(
+            conn, args.users, args.pets_per_user, args.actions_per_pet
+        )
+        print(
+            f"seeded {users} users, {pets} pets, {pets * args.actions_per_pet} "
+            f"actions in {time.perf_counter() - started:.1f}s"
+        )
+
+    queries = hot_queries(users, pets)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+        await print_plans(conn, queries, "without indexes")
+
+        for index in INDEXES:
+            await conn.execute(CreateIndex(index))
+        await conn.execute(text("ANALYZE"))
+
+        await print_plans(conn, queries, "with indexes")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="database URL, defaults to a temp SQLite file")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--pets-per-user", type=int, default=3)
+    parser.add_argument("--actions-per-pet", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
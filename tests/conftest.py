@@ -1,8 +1,9 @@
 import pytest
-from configs.configdb import Base, async_session, get_db
+from configs.configdb import Base, async_session, get_db, get_read_db
 from database import models
 from httpx import ASGITransport, AsyncClient
 from main import app
+from routes.auth import principal_cache
 from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
                                     create_async_engine)
 from sqlalchemy.pool import StaticPool
@@ -44,6 +45,8 @@ async def client(db_session):
         yield db_session
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    principal_cache.clear()
 
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://test"
@@ -51,3 +54,29 @@ async def client(db_session):
         yield ac
 
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(scope="function")
+async def concurrent_client(tmp_path):
+    """Client whose requests each get their own session on a file database."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'concurrent.db'}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def override_get_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    principal_cache.clear()
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac, session_factory
+
+    app.dependency_overrides.clear()
+    await engine.dispose()
@@ -0,0 +1,139 @@
+from datetime import datetime, timezone
+
+import pytest
+import routes.pets
+from configs.configdb import async_session
+from database.models import PetActions
+from fastapi import status
+from middleware.action_buffer import ActionWriteBuffer
+from routes.pets import STAT_ACTIONS
+from sqlalchemy import func, select
+
+from tests.test_pets import get_auth_headers
+
+
+async def start_buffer(monkeypatch, durability, batch_size=10):
+    buffer = ActionWriteBuffer(
+        enabled=True,
+        max_size=100,
+        batch_size=batch_size,
+        flush_interval=0.05,
+        durability=durability,
+    )
+    buffer.start(async_session)
+    monkeypatch.setattr(routes.pets, "action_buffer", buffer)
+    return buffer
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flush_durability(client, monkeypatch):
+    buffer = await start_buffer(monkeypatch, "flush")
+    headers = await get_auth_headers(client, "buffered_user", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Queued"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    for type_stats in ["hunger", "energy", "happiness"]:
+        response = await client.patch(
+            f"/pets/{pet_id}/action", json={"type_stats": type_stats}, headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    history_res = await client.get(f"/pets/{pet_id}/actions_history", headers=headers)
+    assert len(history_res.json()) == 3
+    assert buffer.flushed_total == 3
+    assert buffer.depth == 0
+
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_flushes_on_close(client, db_session, monkeypatch):
+    buffer = await start_buffer(monkeypatch, "memory")
+    headers = await get_auth_headers(client, "batch_buffered", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Backlog"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    payload = {"actions": [{"pet_id": pet_id, "type_stats": "hunger"}] * 25}
+    response = await client.post("/pets/actions", json=payload, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    await buffer.close()
+
+    assert buffer.flushed_total == 25
+    assert buffer.flushes_total >= 3
+    assert await db_session.scalar(select(func.count(PetActions.id))) == 25
+
+
+def hunger_records(pet_id, count):
+    now = datetime.now(timezone.utc)
+    return [
+        {"pet_id": pet_id, "action_type": STAT_ACTIONS["hunger"], "timestamp": now}
+    ] * count
+
+
+@pytest.mark.asyncio
+async def test_flush_durability_waits_for_every_batch(client, db_session, monkeypatch):
+    buffer = await start_buffer(monkeypatch, "flush", batch_size=2)
+    headers = await get_auth_headers(client, "split_submit", "12345")
+    create_res = await client.post(
+        "/pets/create", json={"name": "Split"}, headers=headers
+    )
+
+    await buffer.submit(hunger_records(create_res.json()["id"], 5))
+
+    assert buffer.flushed_total == 5
+    assert await db_session.scalar(select(func.count(PetActions.id))) == 5
+
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_actions_of_deleted_pets_do_not_fail_the_batch(
+    client, db_session, monkeypatch
+):
+    buffer = await start_buffer(monkeypatch, "flush")
+    headers = await get_auth_headers(client, "deleted_actions", "12345")
+    create_res = await client.post(
+        "/pets/create", json={"name": "Stays"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    await buffer.submit(hunger_records(pet_id, 3) + hunger_records(pet_id + 1, 2))
+
+    assert (buffer.flushed_total, buffer.discarded_total) == (3, 2)
+    assert buffer.failed_total == 0
+    assert await db_session.scalar(select(func.count(PetActions.id))) == 3
+
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_latency_includes_failed_attempts(client, monkeypatch):
+    buffer = await start_buffer(monkeypatch, "flush")
+    headers = await get_auth_headers(client, "retried_flush", "12345")
+    create_res = await client.post(
+        "/pets/create", json={"name": "Retry"}, headers=headers
+    )
+
+    attempts = []
+
+    def failing_once():
+        attempts.append(None)
+        if len(attempts) == 1:
+            raise OSError("database restarting")
+        return async_session()
+
+    buffer.session_factory = failing_once
+    await buffer.submit(hunger_records(create_res.json()["id"], 1))
+
+    assert (len(attempts), buffer.flushed_total) == (2, 1)
+    # the 0.5s back-off between the attempts was waited for too
+    assert buffer.last_flush_seconds >= 0.5
+
+    await buffer.close()
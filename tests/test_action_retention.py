@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import routes.pets
+from configs.configdb import async_session
+from database.action_archive import ActionArchive
+from database.action_partitions import month_start, next_month, partition_name
+from database.action_stats import rebuild_action_stats
+from database.models import PetActions
+from fastapi import status
+from middleware.action_partitions import ActionPartitionJob
+from middleware.action_retention import ActionRetentionJob
+from sqlalchemy import func, select, update
+
+from tests.test_pets import get_auth_headers
+
+
+@pytest.mark.asyncio
+async def test_archived_actions_stay_readable(
+    client, db_session, tmp_path, monkeypatch
+):
+    archive = ActionArchive(str(tmp_path / "archive"))
+    monkeypatch.setattr(routes.pets, "action_archive", archive)
+    headers = await get_auth_headers(client, "archive_user", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Oldtimer"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    for type_stats in ["hunger", "energy", "happiness", "hunger"]:
+        await client.patch(
+            f"/pets/{pet_id}/action", json={"type_stats": type_stats}, headers=headers
+        )
+
+    # the first three actions happened a year ago, in different months
+    now = datetime.now(timezone.utc)
+    ids = sorted((await db_session.execute(select(PetActions.id))).scalars().all())
+    for action_id, days in zip(ids, (400, 380, 370)):
+        await db_session.execute(
+            update(PetActions)
+            .where(PetActions.id == action_id)
+            .values(timestamp=now - timedelta(days=days))
+        )
+    await rebuild_action_stats(db_session, pet_id, pet_id + 1)
+    await db_session.commit()
+
+    job = ActionRetentionJob(
+        async_session,
+        archive,
+        retention=timedelta(days=180),
+        batch_size=2,
+        time_budget=60,
+    )
+    report = await job.run_tick()
+
+    assert report.rows == 3
+    assert report.batches == 2
+    assert report.completed
+
+    remaining = await db_session.scalar(select(func.count(PetActions.id)))
+    assert remaining == 1
+
+    first_page = await client.get(
+        f"/pets/{pet_id}/actions_history", params={"limit": 2}, headers=headers
+    )
+    assert first_page.status_code == status.HTTP_200_OK
+    assert [action["action_type"] for action in first_page.json()] == [
+        "feed",
+        "sleep",
+    ]
+
+    second_page = await client.get(
+        f"/pets/{pet_id}/actions_history",
+        params={"limit": 2, "cursor": first_page.headers["X-Next-Cursor"]},
+        headers=headers,
+    )
+    assert [action["action_type"] for action in second_page.json()] == [
+        "play",
+        "feed",
+    ]
+    assert "X-Next-Cursor" not in second_page.headers
+
+    filtered = await client.get(
+        f"/pets/{pet_id}/actions_history",
+        params={"action_type": "feed"},
+        headers=headers,
+    )
+    assert len(filtered.json()) == 2
+
+    streamed = await client.get(
+        f"/pets/{pet_id}/actions_history", params={"stream": True}, headers=headers
+    )
+    assert len(streamed.text.splitlines()) == 4
+
+    # a crash between archiving and deleting must not duplicate history
+    archive.append([(ids[0], pet_id, "feed", now - timedelta(days=400))])
+    history = await client.get(f"/pets/{pet_id}/actions_history", headers=headers)
+    assert len(history.json()) == 4
+
+
+@pytest.mark.asyncio
+async def test_partition_maintenance_months():
+    month = month_start(datetime(2025, 12, 31, 23, 59, tzinfo=timezone.utc))
+
+    assert month == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert next_month(month) == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert partition_name(next_month(month)) == "pet_actions_2026_01"
+
+    # SQLite tables are never partitioned, so there is nothing to maintain
+    job = ActionPartitionJob(async_session, months_ahead=3)
+    assert await job.run_tick() == []
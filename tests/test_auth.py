@@ -1,5 +1,12 @@
+import asyncio
+import time
+
 import pytest
+from database.models import Pet, PetActions
 from fastapi import status
+from routes.auth import get_current_principal, principal_cache
+from sqlalchemy import func, select
+from utils.password_hasher import HasherSaturated, PasswordHasher
 
 
 @pytest.mark.asyncio
@@ -26,3 +33,112 @@ async def test_login_user(client):
     data = response.json()
     assert "access_token" in data
     assert data["token_type"] == "bearer"
+
+
+@pytest.mark.asyncio
+async def test_register_duplicate_username(client):
+    payload = {"username": "twinuser", "password": "mypassword"}
+    await client.post("/auth/register", json=payload)
+
+    response = await client.post("/auth/register", json=payload)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Username already registered"
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_cached_per_token(client):
+    payload = {"username": "cacheduser", "password": "mypassword"}
+    await client.post("/auth/register", json=payload)
+    login_res = await client.post("/auth/login", data=payload)
+    token = login_res.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert principal_cache.get(token) is None
+
+    response = await client.get("/auth/me", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    principal = principal_cache.get(token)
+    assert principal.username == "cacheduser"
+    assert principal.id == response.json()["id"]
+
+    bad_res = await client.get(
+        "/auth/me", headers={"Authorization": "Bearer not-a-token"}
+    )
+    assert bad_res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_saturated():
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+
+    results = await asyncio.gather(
+        *(hasher.hash("secret") for _ in range(3)), return_exceptions=True
+    )
+
+    assert sum(isinstance(result, HasherSaturated) for result in results) == 1
+    hashed = next(result for result in results if isinstance(result, str))
+    assert await hasher.verify("secret", hashed)
+
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_times_bcrypt_only():
+    hasher = PasswordHasher(max_workers=1, max_queue=2)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(hasher.hash("secret") for _ in range(3)))
+    elapsed = time.perf_counter() - started
+
+    # the hashes ran one after the other; time spent queued is not counted
+    assert hasher.completed == 3
+    assert hasher.busy_seconds <= elapsed
+
+    with pytest.raises(ValueError):
+        await hasher.verify("secret", "not a bcrypt hash")
+    assert hasher.completed == 3
+
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_delete_account_cascades(client, db_session):
+    payload = {"username": "leaving_user", "password": "mypassword"}
+    await client.post("/auth/register", json=payload)
+    login_res = await client.post("/auth/login", data=payload)
+    headers = {"Authorization": f"Bearer {login_res.json()['access_token']}"}
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Orphan"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+    await client.patch(
+        f"/pets/{pet_id}/action", json={"type_stats": "hunger"}, headers=headers
+    )
+
+    response = await client.delete("/auth/me", headers=headers)
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert await db_session.scalar(select(func.count(Pet.id))) == 0
+    assert await db_session.scalar(select(func.count(PetActions.id))) == 0
+
+    me_res = await client.get("/auth/me", headers=headers)
+    assert me_res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.asyncio
+async def test_principal_lookup_releases_its_connection(client, db_session):
+    credentials = {"username": "released", "password": "12345"}
+    await client.post("/auth/register", json=credentials)
+    login_res = await client.post("/auth/login", data=credentials)
+    principal_cache.clear()
+
+    principal = await get_current_principal(
+        login_res.json()["access_token"], db_session
+    )
+
+    assert principal.username == "released"
+    # read endpoints go on with a replica session, the primary one sits idle
+    assert not db_session.in_transaction()
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from configs.configdb import DataBaseConfig
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from utils.db_pool import InstrumentedPool, pool_snapshot
+
+
+def test_engine_options_from_env(monkeypatch):
+    monkeypatch.setattr(DataBaseConfig, "DB_HOST", "db.internal")
+    monkeypatch.setattr(DataBaseConfig, "STATEMENT_TIMEOUT_MS", 5000)
+    monkeypatch.setattr(DataBaseConfig, "STATEMENT_CACHE_SIZE", 0)
+    config = DataBaseConfig()
+
+    options = config.engine_options()
+
+    assert "@db.internal:5432/" in config.uri_postgres()
+    assert options["echo"] is False
+    assert options["poolclass"] is InstrumentedPool
+    assert options["connect_args"] == {
+        "prepared_statement_cache_size": 0,
+        "server_settings": {"statement_timeout": "5000"},
+    }
+
+    # asyncpg's connection arguments would break other drivers
+    sqlite_options = config.engine_options("sqlite+aiosqlite:///replica.db")
+    assert "connect_args" not in sqlite_options
+    assert sqlite_options["pool_size"] == options["pool_size"]
+
+
+@pytest.mark.asyncio
+async def test_pool_snapshot_counts_waits_and_timeouts(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedPool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.2,
+    )
+
+    async with engine.connect() as held:
+        await held.execute(text("SELECT 1"))
+
+        snapshot = pool_snapshot(engine)
+        assert snapshot["checked_out"] == 1
+        assert snapshot["checkouts"] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            async with engine.connect():
+                pass
+
+    async def query_after_release():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async with engine.connect() as held:
+        waiter = asyncio.create_task(query_after_release())
+        await asyncio.sleep(0.05)
+        await held.execute(text("SELECT 1"))
+    await waiter
+
+    snapshot = pool_snapshot(engine)
+    assert snapshot["checked_out"] == 0
+    assert snapshot["checkouts"] == 3
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_seconds_max"] >= 0.04
+    assert snapshot["hold_seconds_total"] > 0
+
+    await engine.dispose()
@@ -0,0 +1,77 @@
+import pytest
+from configs.configdb import async_engine
+from httpx import ASGITransport, AsyncClient
+from main import app
+from middleware.metrics import (POOL_METRICS, MetricsMiddleware,
+                                register_pool_metrics, register_query_metrics,
+                                unregister_query_metrics)
+from routes.metrics import read_metrics
+from utils.metrics import MetricsRegistry, metrics
+from utils.query_recorder import statement_listeners
+
+from tests.test_pets import get_auth_headers
+
+
+def sample(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_bucket{le="0.1"} 2',
+        'latency_bucket{le="1.0"} 3',
+        'latency_bucket{le="+Inf"} 4',
+        "latency_sum 3.65",
+        "latency_count 4",
+    ]
+
+
+async def scrape() -> str:
+    response = await read_metrics()
+    assert response.media_type.startswith("text/plain; version=0.0.4")
+    return response.body.decode()
+
+
+@pytest.mark.asyncio
+async def test_metrics_per_route_template(client):
+    headers = await get_auth_headers(client, "metrics_owner", "12345")
+    created = await client.post("/pets/create", json={"name": "Gauge"}, headers=headers)
+    pet_id = created.json()["id"]
+
+    register_query_metrics()
+    register_pool_metrics({"primary": async_engine})
+
+    requests = 'tamago_http_requests_total{method="GET",route="/pets/{pet_id}",status="200"}'
+    queries = 'tamago_http_request_db_queries_count{method="GET",route="/pets/{pet_id}"}'
+    query_total = 'tamago_http_request_db_queries_sum{method="GET",route="/pets/{pet_id}"}'
+    unmatched = 'tamago_http_requests_total{method="GET",route="unmatched",status="404"}'
+    try:
+        before = await scrape()
+
+        async with AsyncClient(
+            transport=ASGITransport(app=MetricsMiddleware(app)), base_url="http://test"
+        ) as measured:
+            await measured.get(f"/pets/{pet_id}", headers=headers)
+            await measured.get(f"/pets/{pet_id}", headers=headers)
+            await measured.get("/no/such/route")
+
+        after = await scrape()
+    finally:
+        unregister_query_metrics()
+        for name, *_ in POOL_METRICS:
+            metrics.unregister(name)
+
+    assert sample(after, requests) - sample(before, requests) == 2
+    assert sample(after, queries) - sample(before, queries) == 2
+    assert sample(after, query_total) - sample(before, query_total) >= 2
+    assert sample(after, unmatched) - sample(before, unmatched) == 1
+    assert 'tamago_db_pool_size{engine="primary"}' in after
+    assert statement_listeners == []
@@ -0,0 +1,202 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from configs.configdb import Base, async_session
+from database.models import Pet, User
+from fastapi import status
+from middleware.pet_decay import (MAX_DECAY, NEVER_CRITICAL, PET_STATS,
+                                  PetDecayJob, as_utc, critical_at_value,
+                                  decay_stats, next_threshold_crossing,
+                                  run_decay_job)
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from utils.leader import create_leader_lock
+
+from tests.test_pets import get_auth_headers
+
+ANCHOR = datetime(2025, 12, 14, 12, 0, tzinfo=timezone.utc)
+FULL = {"hunger": 100, "energy": 80, "happiness": 3}
+
+
+def test_decay_is_lazy_and_exact():
+    stats, anchor = decay_stats(FULL, ANCHOR, ANCHOR + timedelta(minutes=5))
+
+    assert stats == {"hunger": 98, "energy": 78, "happiness": 1}
+    assert anchor == ANCHOR + timedelta(minutes=4)
+
+    later = ANCHOR + timedelta(minutes=9)
+    direct, _ = decay_stats(FULL, ANCHOR, later)
+    chained, _ = decay_stats(stats, anchor, later)
+
+    assert direct == chained == {"hunger": 96, "energy": 76, "happiness": 0}
+
+
+def test_decay_is_capped():
+    now = ANCHOR + timedelta(days=3)
+    stats, anchor = decay_stats(FULL, ANCHOR, now)
+
+    assert stats["hunger"] == 100 - MAX_DECAY
+    assert anchor == now
+
+
+@pytest.mark.asyncio
+async def test_get_pet_applies_decay(client, db_session):
+    headers = await get_auth_headers(client, "decay_user", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Sleepy"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    anchor = datetime.now(timezone.utc) - timedelta(minutes=61)
+    await db_session.execute(
+        update(Pet).where(Pet.id == pet_id).values(last_updated=anchor)
+    )
+    await db_session.commit()
+    db_session.expire_all()
+
+    response = await client.get(f"/pets/{pet_id}", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["hunger"] == 70
+    assert response.json()["energy"] == 70
+
+    action_res = await client.patch(
+        f"/pets/{pet_id}/action", json={"type_stats": "hunger"}, headers=headers
+    )
+
+    assert action_res.json()["hunger"] == 100
+    assert action_res.json()["energy"] == 70
+
+
+@pytest.mark.asyncio
+async def test_decay_job_matches_lazy_evaluation(db_session):
+    now = datetime.now(timezone.utc)
+    anchors = [now - timedelta(minutes=minutes) for minutes in (0, 5, 61, 500)]
+    owner = User(username="decay_owner", password_hash="x")
+    pets = [
+        Pet(name=f"Pet{index}", owner=owner, happiness=40, last_updated=anchor)
+        for index, anchor in enumerate(anchors)
+    ]
+    db_session.add_all(pets)
+    await db_session.commit()
+
+    expected = [
+        decay_stats({"hunger": 100, "happiness": 40}, anchor, now)
+        for anchor in anchors
+    ]
+
+    job = PetDecayJob(async_session, chunk_size=1, time_budget=60)
+    report = await job.run_tick(now)
+
+    assert report.rows == 3
+    assert report.chunks == 4
+    assert report.completed
+
+    for pet, (stats, anchor) in zip(pets, expected):
+        await db_session.refresh(pet)
+        assert {"hunger": pet.hunger, "happiness": pet.happiness} == stats
+        assert abs(as_utc(pet.last_updated) - anchor) < timedelta(milliseconds=1)
+
+
+@pytest.mark.asyncio
+async def test_critical_at_stops_at_max_decay(db_session):
+    owner = User(username="critical_owner", password_hash="x")
+    pets = [
+        Pet(name=f"Pet{lowest}", owner=owner, hunger=lowest, last_updated=ANCHOR)
+        for lowest in (10, 70, 71)
+    ]
+    db_session.add_all(pets)
+    await db_session.commit()
+
+    expected = [
+        ANCHOR - timedelta(minutes=20),
+        ANCHOR + timedelta(minutes=100),
+        NEVER_CRITICAL,
+    ]
+    assert [as_utc(pet.critical_at) for pet in pets] == expected
+
+    columns = {name: getattr(Pet, name) for name in (*PET_STATS, "last_updated")}
+    await db_session.execute(
+        update(Pet)
+        .where(Pet.owner_id == owner.id)
+        .values(critical_at=critical_at_value(columns))
+    )
+    await db_session.commit()
+
+    for pet in pets:
+        await db_session.refresh(pet)
+    assert [as_utc(pet.critical_at) for pet in pets] == expected
+
+
+@pytest.mark.asyncio
+async def test_decay_scheduler_elects_single_leader(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'decay.db'}")
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    ticks = [0, 0, 0]
+    ticked = asyncio.Event()
+
+    def counted(index, run_tick):
+        async def tick():
+            report = await run_tick()
+            ticks[index] += 1
+            ticked.set()
+            return report
+
+        return tick
+
+    async def wait_until(condition):
+        while not condition():
+            ticked.clear()
+            await asyncio.wait_for(ticked.wait(), timeout=5)
+
+    workers = []
+    for index in range(3):
+        job = PetDecayJob(session_factory, chunk_size=100, time_budget=60)
+        job.run_tick = counted(index, job.run_tick)
+        lock = create_leader_lock(engine, "pet-decay", str(tmp_path))
+        workers.append(asyncio.create_task(run_decay_job(job, 0.01, lock)))
+
+    await wait_until(lambda: any(ticks))
+    [leader] = [index for index, count in enumerate(ticks) if count]
+    # followers keep retrying the lock in the meantime
+    await wait_until(lambda: ticks[leader] >= 3)
+    assert [count for index, count in enumerate(ticks) if index != leader] == [0, 0]
+
+    workers[leader].cancel()
+    await asyncio.gather(workers[leader], return_exceptions=True)
+    led = ticks[leader]
+
+    await wait_until(lambda: sum(ticks) > led)
+    successors = [
+        index for index, count in enumerate(ticks) if index != leader and count
+    ]
+    assert len(successors) == 1
+    assert ticks[leader] == led
+
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    await engine.dispose()
+
+
+def test_next_threshold_crossing():
+    stats = {"hunger": 60, "energy": 100, "happiness": 21}
+
+    first = next_threshold_crossing(stats, ANCHOR, ANCHOR)
+    assert first == ANCHOR + timedelta(minutes=2)
+
+    second = next_threshold_crossing(stats, ANCHOR, first)
+    assert second == ANCHOR + timedelta(minutes=20)
+
+    # energy cannot fall by more than MAX_DECAY from this anchor
+    energy = next_threshold_crossing({"energy": 100}, ANCHOR, ANCHOR)
+    assert energy == ANCHOR + timedelta(minutes=100)
+
+    assert next_threshold_crossing({"energy": 0}, ANCHOR, ANCHOR) is None
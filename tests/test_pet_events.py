@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import routes.pets
+from fastapi import status
+from middleware.pet_events import PetStateHub
+from routes.pets import stream_pet_events
+from utils.pubsub import LocalBroker, PostgresBroker
+
+from tests.test_pets import get_auth_headers
+
+
+async def start_hub(monkeypatch):
+    hub = PetStateHub(LocalBroker(), queue_size=4)
+    await hub.start()
+    monkeypatch.setattr(routes.pets, "pet_events", hub)
+    return hub
+
+
+@pytest.mark.asyncio
+async def test_actions_are_pushed_to_subscribers(client, monkeypatch):
+    hub = await start_hub(monkeypatch)
+    headers = await get_auth_headers(client, "push_owner", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Pushy"}, headers=headers
+    )
+    pet = create_res.json()
+    pet["last_updated"] = datetime.fromisoformat(pet["last_updated"])
+
+    async with hub.subscribe(pet) as first, hub.subscribe(pet) as second:
+        assert len(hub.channels) == 1
+        assert (await first.get())["energy"] == 100
+        assert (await second.get())["energy"] == 100
+
+        await client.patch(
+            f"/pets/{pet['id']}", json={"name": "Renamed"}, headers=headers
+        )
+        assert (await first.get())["name"] == "Renamed"
+        assert (await second.get())["name"] == "Renamed"
+
+    assert hub.channels == {}
+
+    missing = await client.get("/pets/999/events", headers=headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_threshold_crossings_are_pushed(monkeypatch):
+    hub = await start_hub(monkeypatch)
+
+    # happiness reaches 20 a quarter of a second from now
+    anchor = datetime.now(timezone.utc) - timedelta(minutes=2, seconds=-0.25)
+    state = {
+        "id": 1,
+        "name": "Moody",
+        "owner_id": 1,
+        "hunger": 100,
+        "energy": 100,
+        "happiness": 21,
+        "last_updated": anchor,
+    }
+
+    events = stream_pet_events(state)
+    first = await anext(events)
+    second = await asyncio.wait_for(anext(events), timeout=2)
+
+    assert first.startswith("event: pet\n")
+    assert '"happiness":21' in first
+    assert '"happiness":20' in second
+    assert hub.channels[1].timer is not None
+
+    await events.aclose()
+    assert hub.channels == {}
+
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_deleting_a_pet_ends_its_streams(client, monkeypatch):
+    hub = await start_hub(monkeypatch)
+    headers = await get_auth_headers(client, "deleted_owner", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Gone"}, headers=headers
+    )
+    pet = create_res.json()
+    pet["last_updated"] = datetime.fromisoformat(pet["last_updated"])
+
+    events = stream_pet_events(pet)
+    assert (await anext(events)).startswith("event: pet\n")
+
+    await client.delete(f"/pets/{pet['id']}", headers=headers)
+
+    last = await asyncio.wait_for(anext(events), timeout=2)
+    assert last == f'event: deleted\ndata: {{"id":{pet["id"]}}}\n\n'
+    with pytest.raises(StopAsyncIteration):
+        await anext(events)
+    assert hub.channels == {}
+
+    await hub.close()
+
+
+class FakeDriverConnection:
+    def __init__(self):
+        self.listening = []
+        self.on_terminate = None
+        self.closed = False
+
+    def add_termination_listener(self, callback):
+        self.on_terminate = callback
+
+    async def add_listener(self, channel, callback):
+        self.listening.append(channel)
+
+    def is_closed(self):
+        return self.closed
+
+    def terminate(self):
+        self.closed = True
+        self.on_terminate(self)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.driver_connection = FakeDriverConnection()
+        self.invalidated = False
+
+    async def get_raw_connection(self):
+        return self
+
+    async def invalidate(self):
+        self.invalidated = True
+
+    async def close(self):
+        pass
+
+
+class FlakyEngine:
+    """Hands out fake connections, failing the given number of attempts first."""
+
+    def __init__(self):
+        self.connections = []
+        self.failures = 0
+
+    async def connect(self):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("connection refused")
+        self.connections.append(FakeConnection())
+        return self.connections[-1]
+
+
+@pytest.mark.asyncio
+async def test_postgres_broker_listens_again_after_a_drop():
+    engine = FlakyEngine()
+    broker = PostgresBroker(engine, "pet_state", min_backoff=0.01)
+    await broker.start(lambda message: None)
+
+    engine.failures = 2
+    first = engine.connections[0]
+    first.driver_connection.terminate()
+
+    for _ in range(100):
+        if broker.reconnects:
+            break
+        await asyncio.sleep(0.01)
+
+    assert broker.reconnects == 1
+    assert first.invalidated
+    assert [c.driver_connection.listening for c in engine.connections] == [
+        ["pet_state"],
+        ["pet_state"],
+    ]
+    assert broker.driver_connection is engine.connections[1].driver_connection
+
+    await broker.close()
@@ -1,5 +1,14 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
 import pytest
+import routes.auth
+from database.action_stats import rebuild_action_stats
+from database.models import Pet, PetActions
 from fastapi import status
+from middleware.pet_decay import critical_at_value
+from sqlalchemy import func, select, update
 
 
 async def get_auth_headers(client, username, password):
@@ -64,3 +73,301 @@ async def test_pet_action_feed(client):
     history = history_res.json()
     assert len(history) == 1
     assert history[0]["action_type"] == "feed"
+
+
+@pytest.mark.asyncio
+async def test_actions_history_pagination(client):
+    headers = await get_auth_headers(client, "history_user", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Chatty"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    for type_stats in ["hunger", "energy", "hunger", "happiness", "hunger"]:
+        await client.patch(
+            f"/pets/{pet_id}/action", json={"type_stats": type_stats}, headers=headers
+        )
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get(
+            f"/pets/{pet_id}/actions_history", params=params, headers=headers
+        )
+        assert response.status_code == status.HTTP_200_OK
+        seen.extend(action["id"] for action in response.json())
+
+        if "x-next-cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["x-next-cursor"]
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
+
+    feed_res = await client.get(
+        f"/pets/{pet_id}/actions_history",
+        params={"action_type": "feed"},
+        headers=headers,
+    )
+    assert len(feed_res.json()) == 3
+
+    stream_res = await client.get(
+        f"/pets/{pet_id}/actions_history", params={"stream": True}, headers=headers
+    )
+    assert stream_res.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in stream_res.text.splitlines()]
+    assert [action["id"] for action in lines] == seen
+
+
+@pytest.mark.asyncio
+async def test_concurrent_actions_lose_no_updates(concurrent_client):
+    client, session_factory = concurrent_client
+    headers = await get_auth_headers(client, "busy_user", "12345")
+
+    pet_ids = []
+    for index in range(100):
+        create_res = await client.post(
+            "/pets/create", json={"name": f"Pet{index:03}"}, headers=headers
+        )
+        pet_ids.append(create_res.json()["id"])
+
+    async with session_factory() as db:
+        await db.execute(update(Pet).values(hunger=0, energy=0))
+        await db.commit()
+
+    responses = await asyncio.gather(
+        *(
+            client.patch(
+                f"/pets/{pet_id}/action",
+                json={"type_stats": type_stats},
+                headers=headers,
+            )
+            for pet_id in pet_ids
+            for type_stats in ["hunger", "energy", "hunger"]
+        )
+    )
+    assert all(response.status_code == status.HTTP_200_OK for response in responses)
+
+    async with session_factory() as db:
+        pets = (await db.execute(select(Pet.hunger, Pet.energy))).all()
+        action_count = await db.scalar(select(func.count(PetActions.id)))
+
+    assert set(pets) == {(60, 30)}
+    assert action_count == 300
+
+
+@pytest.mark.asyncio
+async def test_batch_actions(client):
+    headers = await get_auth_headers(client, "batch_user", "12345")
+    other_headers = await get_auth_headers(client, "other_user", "12345")
+
+    pet_ids = []
+    for name in ["Alpha", "Bravo"]:
+        create_res = await client.post(
+            "/pets/create", json={"name": name}, headers=headers
+        )
+        pet_ids.append(create_res.json()["id"])
+    foreign_res = await client.post(
+        "/pets/create", json={"name": "Charlie"}, headers=other_headers
+    )
+    foreign_id = foreign_res.json()["id"]
+
+    payload = {
+        "actions": [
+            {"pet_id": pet_ids[0], "type_stats": "hunger"},
+            {"pet_id": pet_ids[1], "type_stats": "energy"},
+            {"pet_id": pet_ids[0], "type_stats": "happiness"},
+            {"pet_id": foreign_id, "type_stats": "hunger"},
+            {"pet_id": pet_ids[1], "type_stats": "sleep"},
+        ]
+    }
+    response = await client.post("/pets/actions", json=payload, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [result["status"] for result in results] == [
+        "ok",
+        "ok",
+        "ok",
+        "not_found",
+        "invalid_stat",
+    ]
+    assert results[0]["pet"]["id"] == pet_ids[0]
+    assert results[3]["pet"] is None
+
+    history_res = await client.get(
+        f"/pets/{pet_ids[0]}/actions_history", headers=headers
+    )
+    assert {action["action_type"] for action in history_res.json()} == {
+        "feed",
+        "sleep",
+    }
+
+
+@pytest.mark.asyncio
+async def test_delete_pet(client):
+    headers = await get_auth_headers(client, "delete_user", "12345")
+    other_headers = await get_auth_headers(client, "stranger", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Goner"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    stranger_res = await client.delete(f"/pets/{pet_id}", headers=other_headers)
+    assert stranger_res.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await client.delete(f"/pets/{pet_id}", headers=headers)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    get_res = await client.get(f"/pets/{pet_id}", headers=headers)
+    assert get_res.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_pet_daily_stats(client, db_session):
+    headers = await get_auth_headers(client, "stats_owner", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Counted"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    for type_stats in ["hunger", "hunger", "energy"]:
+        await client.patch(
+            f"/pets/{pet_id}/action", json={"type_stats": type_stats}, headers=headers
+        )
+    await client.post(
+        "/pets/actions",
+        json={"actions": [{"pet_id": pet_id, "type_stats": "happiness"}] * 2},
+        headers=headers,
+    )
+
+    response = await client.get(
+        f"/pets/{pet_id}/stats", params={"days": 7}, headers=headers
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    days = response.json()
+    assert len(days) == 7
+    assert days[-1] == {
+        "day": datetime.now(timezone.utc).date().isoformat(),
+        "feed": 2,
+        "play": 1,
+        "sleep": 2,
+    }
+    assert all(day["feed"] == 0 for day in days[:-1])
+
+    await rebuild_action_stats(db_session, pet_id, pet_id + 1)
+    await db_session.commit()
+
+    rebuilt = await client.get(
+        f"/pets/{pet_id}/stats", params={"days": 7}, headers=headers
+    )
+    assert rebuilt.json() == days
+
+    other_headers = await get_auth_headers(client, "stats_stranger", "12345")
+    foreign = await client.get(f"/pets/{pet_id}/stats", headers=other_headers)
+    assert foreign.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_get_pet_conditional(client):
+    headers = await get_auth_headers(client, "etag_owner", "12345")
+
+    create_res = await client.post(
+        "/pets/create", json={"name": "Tagged"}, headers=headers
+    )
+    pet_id = create_res.json()["id"]
+
+    first = await client.get(f"/pets/{pet_id}", headers=headers)
+    etag = first.headers["ETag"]
+
+    cached = await client.get(
+        f"/pets/{pet_id}", headers={**headers, "If-None-Match": etag}
+    )
+    assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+    assert cached.headers["ETag"] == etag
+    assert cached.content == b""
+
+    me = await client.get("/auth/me", headers=headers)
+    me_etag = me.headers["ETag"]
+    assert me.json()["pets"] == [first.json()]
+    me_cached = await client.get(
+        "/auth/me", headers={**headers, "If-None-Match": f'W/{me_etag}, "other"'}
+    )
+    assert me_cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+    await client.patch(f"/pets/{pet_id}", json={"name": "Renamed"}, headers=headers)
+
+    changed = await client.get(
+        f"/pets/{pet_id}", headers={**headers, "If-None-Match": etag}
+    )
+    assert changed.status_code == status.HTTP_200_OK
+    assert changed.json()["name"] == "Renamed"
+    assert changed.headers["ETag"] != etag
+
+    me_changed = await client.get(
+        "/auth/me", headers={**headers, "If-None-Match": me_etag}
+    )
+    assert me_changed.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_pets_by_urgency(client, db_session, monkeypatch):
+    headers = await get_auth_headers(client, "urgent_owner", "12345")
+
+    ids = {}
+    for name in ("Calm", "Bored", "Hungry"):
+        create_res = await client.post(
+            "/pets/create", json={"name": name}, headers=headers
+        )
+        ids[name] = create_res.json()["id"]
+
+    # critical_at follows the stats the same way as a decay or action would
+    for name, stats in (("Bored", {"happiness": 30}), ("Hungry", {"hunger": 21})):
+        values = {
+            "hunger": Pet.hunger,
+            "energy": Pet.energy,
+            "happiness": Pet.happiness,
+            "last_updated": Pet.last_updated,
+            **stats,
+        }
+        await db_session.execute(
+            update(Pet)
+            .where(Pet.id == ids[name])
+            .values(**stats, critical_at=critical_at_value(values))
+        )
+    await db_session.commit()
+
+    first = await client.get("/pets/urgent?limit=2", headers=headers)
+    assert [pet["id"] for pet in first.json()] == [ids["Hungry"], ids["Bored"]]
+
+    cursor = first.headers["X-Next-Cursor"]
+    second = await client.get(f"/pets/urgent?limit=2&cursor={cursor}", headers=headers)
+    assert [pet["id"] for pet in second.json()] == [ids["Calm"]]
+    # more than MAX_DECAY above the level, so never critical from its stored state
+    assert second.json()[0]["critical_at"].startswith("9999-12-31")
+    assert "X-Next-Cursor" not in second.headers
+
+    soon = await client.get("/pets/urgent?within_minutes=30", headers=headers)
+    assert [pet["id"] for pet in soon.json()] == [ids["Hungry"], ids["Bored"]]
+
+    await client.patch(
+        f"/pets/{ids['Hungry']}/action", json={"type_stats": "hunger"}, headers=headers
+    )
+    fed = await client.get("/pets/urgent", headers=headers)
+    assert [pet["id"] for pet in fed.json()] == [
+        ids["Bored"],
+        ids["Hungry"],
+        ids["Calm"],
+    ]
+
+    support = await get_auth_headers(client, "support_user", "12345")
+    denied = await client.get("/pets/needing_attention", headers=support)
+    assert denied.status_code == status.HTTP_403_FORBIDDEN
+
+    monkeypatch.setattr(routes.auth, "SUPPORT_USERNAMES", {"support_user"})
+    attention = await client.get("/pets/needing_attention", headers=support)
+    assert [pet["id"] for pet in attention.json()] == [ids["Bored"]]
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from main import app
+from middleware.profiler import ProfilerMiddleware
+from sqlalchemy import text
+from utils.stack_sampler import WAITING
+
+from tests.conftest import test_engine
+from tests.test_pets import get_auth_headers
+
+SPIN = "test_only_slow_requests_are_profiled.<locals>.spin"
+
+
+def read_profiles(path):
+    return [
+        (json.loads(report.read_text()), report.with_suffix(".folded").read_text())
+        for report in sorted(path.glob("*.json"))
+    ]
+
+
+@pytest.mark.asyncio
+async def test_sampled_request_lists_its_sql(client, tmp_path):
+    headers = await get_auth_headers(client, "profiled_owner", "12345")
+    created = await client.post("/pets/create", json={"name": "Flame"}, headers=headers)
+    pet_id = created.json()["id"]
+
+    profiled = ProfilerMiddleware(app, str(tmp_path), sample_rate=1.0)
+    async with AsyncClient(
+        transport=ASGITransport(app=profiled), base_url="http://test"
+    ) as profiled_client:
+        response = await profiled_client.get(f"/pets/{pet_id}", headers=headers)
+
+    assert response.status_code == 200
+    [(report, _)] = read_profiles(tmp_path)
+    assert report["route"] == "/pets/{pet_id}"
+    assert report["reason"] == "sampled"
+    assert report["status"] == 200
+    assert any(
+        query["statement"].startswith("SELECT pets.id") for query in report["queries"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_only_slow_requests_are_profiled(tmp_path):
+    slow_app = FastAPI()
+
+    def spin(seconds):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    @slow_app.get("/slow")
+    async def slow():
+        await asyncio.sleep(0.1)
+        spin(0.05)
+
+    @slow_app.get("/fast")
+    async def fast():
+        return None
+
+    profiled = ProfilerMiddleware(slow_app, str(tmp_path), slow_ms=20, interval_ms=1)
+    async with AsyncClient(
+        transport=ASGITransport(app=profiled), base_url="http://test"
+    ) as profiled_client:
+        await profiled_client.get("/fast")
+        await profiled_client.get("/slow")
+
+    [(report, folded)] = read_profiles(tmp_path)
+    assert (report["route"], report["reason"]) == ("/slow", "slow")
+    assert report["samples"] > 10
+
+    stacks = dict(line.rsplit(" ", 1) for line in folded.splitlines())
+    assert sum(int(count) for count in stacks.values()) == report["samples"]
+    # suspended in the sleep, then busy in the loop
+    assert any(".slow (" in stack and stack.endswith(WAITING) for stack in stacks)
+    assert any(stack.split(";")[-1].startswith(SPIN) for stack in stacks)
+
+
+@pytest.mark.asyncio
+async def test_statements_before_the_slow_threshold_are_only_counted(tmp_path):
+    slow_app = FastAPI()
+
+    @slow_app.get("/slow")
+    async def slow():
+        async with test_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(0.05)
+            await conn.execute(text("SELECT 2"))
+
+    profiled = ProfilerMiddleware(slow_app, str(tmp_path), slow_ms=20)
+    async with AsyncClient(
+        transport=ASGITransport(app=profiled), base_url="http://test"
+    ) as profiled_client:
+        await profiled_client.get("/slow")
+
+    [(report, _)] = read_profiles(tmp_path)
+    assert (report["sql_count"], report["unrecorded_queries"]) == (2, 1)
+    assert [query["statement"] for query in report["queries"]] == ["SELECT 2"]
@@ -0,0 +1,109 @@
+import pytest
+from routes.auth import principal_cache
+from utils.query_recorder import QueryRecorder
+
+from tests.test_pets import get_auth_headers
+
+# most statements a request may run, token lookup included; raise a budget
+# only together with the change that needs the extra round trip
+BUDGETS = {
+    "POST /auth/register": 1,
+    "POST /auth/login": 1,
+    "GET /auth/me": 3,
+    "DELETE /auth/me": 3,
+    "POST /pets/create": 4,
+    "GET /pets/urgent": 2,
+    "GET /pets/{pet_id}": 2,
+    "PATCH /pets/{pet_id}": 4,
+    "DELETE /pets/{pet_id}": 2,
+    "PATCH /pets/{pet_id}/action": 4,
+    "POST /pets/actions": 6,
+    "GET /pets/{pet_id}/stats": 3,
+    "GET /pets/{pet_id}/actions_history": 3,
+}
+
+
+async def record(client, method, url, **kwargs) -> QueryRecorder:
+    # without a cached principal the token lookup is counted too
+    principal_cache.clear()
+    with QueryRecorder() as queries:
+        response = await client.request(method, url, **kwargs)
+    assert response.status_code < 400, response.text
+    return queries
+
+
+async def record_endpoints(client, username: str, pets: int) -> dict:
+    headers = await get_auth_headers(client, username, "12345")
+    pet_ids = []
+    for index in range(pets):
+        created = await client.post(
+            "/pets/create", json={"name": f"Pet{index}"}, headers=headers
+        )
+        pet_ids.append(created.json()["id"])
+        await client.patch(
+            f"/pets/{pet_ids[-1]}/action",
+            json={"type_stats": "hunger"},
+            headers=headers,
+        )
+    pet_id = pet_ids[0]
+    credentials = {"username": f"{username}_new", "password": "12345"}
+    batch = [{"pet_id": each, "type_stats": "energy"} for each in pet_ids]
+
+    calls = [
+        ("POST /auth/register", "POST", "/auth/register", {"json": credentials}),
+        ("POST /auth/login", "POST", "/auth/login", {"data": credentials}),
+        ("GET /auth/me", "GET", "/auth/me", {}),
+        ("POST /pets/create", "POST", "/pets/create", {"json": {"name": "Extra"}}),
+        ("GET /pets/urgent", "GET", "/pets/urgent", {}),
+        ("GET /pets/{pet_id}", "GET", f"/pets/{pet_id}", {}),
+        ("PATCH /pets/{pet_id}", "PATCH", f"/pets/{pet_id}", {"json": {"name": "Ada"}}),
+        (
+            "PATCH /pets/{pet_id}/action",
+            "PATCH",
+            f"/pets/{pet_id}/action",
+            {"json": {"type_stats": "happiness"}},
+        ),
+        ("POST /pets/actions", "POST", "/pets/actions", {"json": {"actions": batch}}),
+        ("GET /pets/{pet_id}/stats", "GET", f"/pets/{pet_id}/stats", {}),
+        (
+            "GET /pets/{pet_id}/actions_history",
+            "GET",
+            f"/pets/{pet_id}/actions_history",
+            {},
+        ),
+        ("DELETE /pets/{pet_id}", "DELETE", f"/pets/{pet_ids[-1]}", {}),
+        ("DELETE /auth/me", "DELETE", "/auth/me", {}),
+    ]
+
+    recorded = {}
+    for endpoint, method, url, kwargs in calls:
+        kwargs.setdefault("headers", headers)
+        recorded[endpoint] = await record(client, method, url, **kwargs)
+    return recorded
+
+
+@pytest.mark.asyncio
+async def test_endpoints_stay_within_query_budget(client):
+    recorded = await record_endpoints(client, "budget_owner", pets=3)
+
+    assert set(recorded) == set(BUDGETS)
+    over_budget = [
+        f"{endpoint} (budget {BUDGETS[endpoint]}): {queries.report()}"
+        for endpoint, queries in recorded.items()
+        if len(queries) > BUDGETS[endpoint]
+    ]
+    assert not over_budget, "\n\n".join(over_budget)
+
+
+@pytest.mark.asyncio
+async def test_queries_do_not_grow_with_pets(client):
+    few = await record_endpoints(client, "one_pet_owner", pets=1)
+    many = await record_endpoints(client, "many_pets_owner", pets=6)
+
+    grown = [
+        f"{endpoint}: {len(few[endpoint])} statements with one pet, "
+        f"{len(queries)} with six\n{queries.report()}"
+        for endpoint, queries in many.items()
+        if len(queries) > len(few[endpoint]) or queries.repeated()
+    ]
+    assert not grown, "\n\n".join(grown)
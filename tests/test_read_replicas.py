@@ -0,0 +1,94 @@
+import pytest
+import configs.configdb
+from configs.configdb import Base, DataBaseConfig, create_read_router, get_db
+from database.models import Pet, User
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from main import app
+from middleware.read_your_writes import ReadYourWritesMiddleware
+from routes.auth import create_access_token, principal_cache
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+async def create_database(path, pet_name):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_sessionmaker(bind=engine)() as db:
+        owner = User(username="replicated", password_hash="x")
+        db.add(Pet(name=pet_name, owner=owner))
+        await db.commit()
+
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_reads_are_routed_to_replicas(tmp_path, monkeypatch):
+    primary = await create_database(tmp_path / "primary.db", "Primary")
+    for name in ("ReplicaA", "ReplicaB"):
+        seeded = await create_database(tmp_path / f"{name}.db", name)
+        await seeded.dispose()
+
+    # engines built from DB_REPLICA_URLS, with the options the app gives them
+    monkeypatch.setattr(
+        DataBaseConfig,
+        "REPLICA_URLS",
+        [
+            f"sqlite+aiosqlite:///{tmp_path / name}.db"
+            for name in ("ReplicaA", "ReplicaB", "missing/Replica")
+        ],
+    )
+    monkeypatch.setattr(DataBaseConfig, "REPLICA_EJECT_SECONDS", 60)
+    router = create_read_router()
+    replica_a, replica_b, unreachable = router.engines
+    router.engines.remove(unreachable)
+
+    primary_session = async_sessionmaker(bind=primary)
+    monkeypatch.setattr(configs.configdb, "async_session", primary_session)
+    monkeypatch.setattr(configs.configdb, "read_router", router)
+
+    async def override_get_db():
+        async with primary_session() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    principal_cache.clear()
+    token = create_access_token({"username": "replicated"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with AsyncClient(
+        transport=ASGITransport(app=ReadYourWritesMiddleware(app, window=60)),
+        base_url="http://test",
+    ) as client:
+        names = [
+            (await client.get("/pets/1", headers=headers)).json()["name"]
+            for _ in range(4)
+        ]
+        assert names == ["ReplicaA", "ReplicaB", "ReplicaA", "ReplicaB"]
+
+        me = await client.get("/auth/me", headers=headers)
+        assert me.json()["pets"][0]["name"] == "ReplicaA"
+
+        # a broken replica is skipped and ejected
+        router.engines.append(unreachable)
+        names = [
+            (await client.get("/pets/1", headers=headers)).json()["name"]
+            for _ in range(3)
+        ]
+        assert sorted(names) == ["ReplicaA", "ReplicaA", "ReplicaB"]
+        assert list(router.ejected_until) == [unreachable]
+
+        # after a write this client reads from the primary
+        update_res = await client.patch(
+            "/pets/1", json={"name": "Renamed"}, headers=headers
+        )
+        assert update_res.status_code == status.HTTP_200_OK
+
+        response = await client.get("/pets/1", headers=headers)
+        assert response.json()["name"] == "Renamed"
+
+    app.dependency_overrides.clear()
+    for engine in (primary, replica_a, replica_b, unreachable):
+        await engine.dispose()
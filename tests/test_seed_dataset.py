@@ -0,0 +1,100 @@
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from configs.configdb import Base
+from database.models import Pet, PetActionDaily, PetActions, User
+from scripts.seed_dataset import SeedOptions, seed_dataset
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+NOW = datetime(2025, 12, 14, 12, 0, tzinfo=timezone.utc)
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+async def seeded_rows(path, options):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    report = await seed_dataset(engine, options)
+
+    async with engine.connect() as conn:
+        pets = (await conn.execute(select(Pet).order_by(Pet.id))).all()
+        actions = (await conn.execute(select(PetActions).order_by(PetActions.id))).all()
+        counted = await conn.scalar(select(func.sum(PetActionDaily.count)))
+        users = await conn.scalar(select(func.count()).select_from(User))
+
+    await engine.dispose()
+    return report, pets, actions, counted, users
+
+
+@pytest.mark.asyncio
+async def test_seed_dataset_is_deterministic(tmp_path):
+    options = SeedOptions(users=50, actions_per_pet=5, seed=7, now=NOW, chunk_size=20)
+
+    report, pets, actions, counted, users = await seeded_rows(
+        tmp_path / "first.db", options
+    )
+    _, same_pets, same_actions, _, _ = await seeded_rows(
+        tmp_path / "second.db", options
+    )
+
+    assert users == 50
+    assert report.pets == len(pets) >= 50
+    assert report.actions == len(actions) == counted
+    assert pets == same_pets
+    assert actions == same_actions
+    assert all(action.timestamp <= NOW.replace(tzinfo=None) for action in actions)
+
+
+@pytest.mark.asyncio
+async def test_seed_dataset_refuses_taken_usernames(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'taken.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # gets id 1, while the seeded users start at id 2 and user2
+        await conn.execute(insert(User).values(username="user2", password_hash="x"))
+
+    with pytest.raises(ValueError, match="user2"):
+        await seed_dataset(engine, SeedOptions(users=5, now=NOW))
+
+    report = await seed_dataset(
+        engine, SeedOptions(users=5, now=NOW, username_prefix="seeded")
+    )
+    async with engine.connect() as conn:
+        users = await conn.scalar(select(func.count()).select_from(User))
+
+    await engine.dispose()
+    assert report.first_user_id == 2
+    assert users == 6
+
+
+@pytest.mark.asyncio
+async def test_seed_dataset_command_loads_sqlite(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'cli.db'}"
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    command = [
+        sys.executable,
+        "-m",
+        "scripts.seed_dataset",
+        "--url",
+        url,
+        "--users",
+        "20",
+        "--now",
+        NOW.isoformat(),
+    ]
+    done = subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.splitlines()[-1].startswith("done: 20 users from id 1")
+
+    async with engine.connect() as conn:
+        users = await conn.scalar(select(func.count()).select_from(User))
+    await engine.dispose()
+    assert users == 20
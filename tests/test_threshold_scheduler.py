@@ -0,0 +1,168 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from configs.configdb import async_session
+from database.models import Pet
+from middleware.pet_decay import PetDecayJob, as_utc
+from middleware.threshold_scheduler import LocalHook, ThresholdScheduler
+from sqlalchemy import update
+
+from tests.test_pet_events import start_hub
+from tests.test_pets import get_auth_headers
+
+ANCHOR = datetime(2025, 12, 14, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_crossings_stop_at_max_decay():
+    hook = LocalHook()
+    scheduler = ThresholdScheduler(async_session, hook, chunk_size=100)
+    state = {"owner_id": 1, "hunger": 100, "energy": 100, "happiness": 100}
+    scheduler.track(1, {**state, "last_updated": ANCHOR}, ANCHOR)
+
+    assert scheduler.fire_due(ANCHOR + timedelta(minutes=99)) == 0
+    assert scheduler.fire_due(ANCHOR + timedelta(minutes=100)) == 3
+    assert scheduler.fire_due(ANCHOR + timedelta(minutes=1000)) == 0
+    await asyncio.sleep(0)
+
+    events = [hook.events.get_nowait() for _ in range(3)]
+    assert [(event.stat, event.level) for event in events] == [
+        ("energy", 50),
+        ("happiness", 50),
+        ("hunger", 50),
+    ]
+    assert hook.events.empty()
+    # no crossing left, so the pet is no longer kept
+    assert scheduler.pets == {}
+
+
+@pytest.mark.asyncio
+async def test_emitted_levels_match_reads(client, db_session):
+    hook = LocalHook()
+    scheduler = ThresholdScheduler(async_session, hook, chunk_size=100)
+    headers = await get_auth_headers(client, "threshold_reader", "12345")
+    created = await client.post(
+        "/pets/create", json={"name": "Steady"}, headers=headers
+    )
+    pet = created.json()
+    stats = {"hunger": 100, "energy": 60, "happiness": 30}
+
+    scheduler.track(pet["id"], {**pet, **stats, "last_updated": ANCHOR}, ANCHOR)
+    for minutes in range(0, 400, 10):
+        scheduler.fire_due(ANCHOR + timedelta(minutes=minutes))
+    await asyncio.sleep(0)
+
+    events = []
+    while not hook.events.empty():
+        events.append(hook.events.get_nowait())
+    assert {(event.stat, event.level) for event in events} == {
+        ("hunger", 50),
+        ("energy", 50),
+        ("energy", 20),
+        ("happiness", 20),
+        ("happiness", 0),
+    }
+
+    for event in events:
+        # read the pet as it is at the event, by moving its anchor back instead
+        elapsed = event.at - ANCHOR
+        await db_session.execute(
+            update(Pet)
+            .where(Pet.id == pet["id"])
+            .values(**stats, last_updated=datetime.now(timezone.utc) - elapsed)
+        )
+        await db_session.commit()
+        read = await client.get(f"/pets/{pet['id']}", headers=headers)
+        assert read.json()[event.stat] == event.level
+
+
+@pytest.mark.asyncio
+async def test_scheduler_follows_published_states(client, db_session, monkeypatch):
+    hub = await start_hub(monkeypatch)
+    hook = LocalHook()
+    scheduler = ThresholdScheduler(async_session, hook, chunk_size=1)
+    hub.listeners.append(scheduler.update)
+    headers = await get_auth_headers(client, "threshold_owner", "12345")
+
+    first = await client.post("/pets/create", json={"name": "Early"}, headers=headers)
+    pet_id = first.json()["id"]
+
+    # happiness reaches 20 a quarter of a second from now
+    anchor = datetime.now(timezone.utc) - timedelta(minutes=2, seconds=-0.25)
+    await db_session.execute(
+        update(Pet).where(Pet.id == pet_id).values(happiness=21, last_updated=anchor)
+    )
+    await db_session.commit()
+
+    runner = asyncio.create_task(scheduler.run_for(5))
+    event = await asyncio.wait_for(hook.events.get(), timeout=2)
+
+    assert (event.pet_id, event.stat, event.level) == (pet_id, "happiness", 20)
+
+    second = await client.post("/pets/create", json={"name": "Later"}, headers=headers)
+    second_id = second.json()["id"]
+    created = as_utc(datetime.fromisoformat(second.json()["last_updated"]))
+
+    assert scheduler.pets[second_id].due == created + timedelta(minutes=100)
+
+    action = await client.patch(
+        f"/pets/{pet_id}/action", json={"type_stats": "happiness"}, headers=headers
+    )
+    assert scheduler.pets[pet_id].state["happiness"] == action.json()["happiness"]
+    assert scheduler.pets[pet_id].due > datetime.now(timezone.utc)
+
+    await client.delete(f"/pets/{second_id}", headers=headers)
+    assert second_id not in scheduler.pets
+
+    runner.cancel()
+    await asyncio.gather(runner, return_exceptions=True)
+    await scheduler.close()
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_scheduler_follows_the_decay_job(client, db_session, monkeypatch):
+    hub = await start_hub(monkeypatch)
+    hook = LocalHook()
+    scheduler = ThresholdScheduler(async_session, hook, chunk_size=100)
+    hub.listeners.append(scheduler.update)
+    job = PetDecayJob(async_session, chunk_size=100, time_budget=60)
+    job.listeners.append(hub.publish_decayed)
+
+    headers = await get_auth_headers(client, "decay_follower", "12345")
+    ids = []
+    for name in ("Drifting", "Spent"):
+        created = await client.post(
+            "/pets/create", json={"name": name}, headers=headers
+        )
+        ids.append(created.json()["id"])
+    drifting, spent = ids
+
+    anchor = datetime.now(timezone.utc) - timedelta(minutes=60)
+    await db_session.execute(
+        update(Pet).where(Pet.id == drifting).values(last_updated=anchor)
+    )
+    await db_session.execute(
+        update(Pet)
+        .where(Pet.id == spent)
+        .values(hunger=0, energy=0, happiness=0, last_updated=anchor)
+    )
+    await db_session.commit()
+
+    await scheduler.rebuild()
+    assert list(scheduler.pets) == [drifting]
+    # 20 is more than MAX_DECAY below the stored 100
+    assert scheduler.pets[drifting].due == anchor + timedelta(minutes=100)
+
+    await job.run_tick()
+    await scheduler.run_for(0)
+
+    assert scheduler.pets[drifting].state["hunger"] == 70
+    assert scheduler.fire_due(anchor + timedelta(minutes=160)) == 6
+    await asyncio.sleep(0)
+    levels = [hook.events.get_nowait().level for _ in range(6)]
+    assert levels == [50, 50, 50, 20, 20, 20]
+
+    await scheduler.close()
+    await hub.close()